@@ -0,0 +1,89 @@
+"""Alineación de varias series (con frecuencias mixtas) sobre un índice común."""
+import numpy as np
+import pandas as pd
+
+# Valores de la columna 'Frecuencia' del índice, de la más fina a la más gruesa
+FRECUENCIAS = ["Diaria", "Mensual", "Trimestral", "Semestral", "Anual"]
+
+# Modos de conversión: etiqueta visible -> agregación por período
+MODOS_AGREGACION = {"Último": "last", "Promedio": "mean", "Suma": "sum"}
+
+# Ventanas de fechas: etiqueta visible -> cuánto se mira hacia atrás desde el último dato
+VENTANAS = {
+    "Todo": None,
+    "20 años": pd.DateOffset(years=20),
+    "10 años": pd.DateOffset(years=10),
+    "5 años": pd.DateOffset(years=5),
+    "3 años": pd.DateOffset(years=3),
+    "1 año": pd.DateOffset(years=1),
+    "6 meses": pd.DateOffset(months=6),
+}
+
+def period_labels(index, freq):
+    """Etiqueta de período para cada fecha.
+
+    Como en el libro (ej. '2004-12' para el año 2004), cada período se rotula
+    con el primer día de su último mes; las diarias con el día.
+    """
+    if freq == "Diaria":
+        return index.normalize()
+    if freq == "Mensual":
+        months = index.month
+    elif freq == "Trimestral":
+        months = ((index.month - 1) // 3 + 1) * 3
+    elif freq == "Semestral":
+        months = np.where(index.month <= 6, 6, 12)
+    elif freq == "Anual":
+        months = np.full(len(index), 12)
+    else:
+        raise ValueError(f"Frecuencia desconocida: {freq}")
+    return pd.DatetimeIndex(pd.to_datetime({"year": index.year, "month": months, "day": 1}), name=index.name)
+
+def to_frequency(serie, freq, how="last"):
+    """Lleva una serie a `freq` agregando por período ('last', 'mean' o 'sum').
+
+    Las series más gruesas que `freq` quedan como están (no se interpola).
+    """
+    if serie.empty:
+        return serie
+    grouped = serie.groupby(period_labels(serie.index, freq), sort=True)
+    if how == "sum":
+        return grouped.sum(min_count=1)
+    if how == "mean":
+        return grouped.mean()
+    if how == "last":
+        return grouped.last()
+    raise ValueError(f"Modo de agregación desconocido: {how}")
+
+def align_series(series, freq=None, how="last"):
+    """Une N series en un DataFrame con el índice unión, en una sola pasada de concat"""
+    series = [s for s in series if s is not None]
+    if not series:
+        return pd.DataFrame()
+    if freq is not None:
+        series = [to_frequency(s, freq, how) for s in series]
+    return pd.concat(series, axis=1, sort=True)
+
+def window_bounds(ventana, last_date):
+    """(desde, hasta) para una etiqueta de VENTANAS (None = toda la historia). `hasta` queda
+    abierto: `last_date` ya es el último dato, y como la ventana también se aplica después de
+    to_frequency, cortarla ahí dejaría afuera el último período (period_labels lo fecha al
+    primer día de su último mes)"""
+    offset = VENTANAS.get(ventana)
+    if offset is None or last_date is None or pd.isna(last_date):
+        return None
+    return ((pd.Timestamp(last_date) - offset).strftime('%Y-%m-%d'), None)
+
+def window_positions(index, window):
+    """Posiciones [i, j) de `window` en un índice de fechas ordenado (búsqueda binaria)"""
+    desde, hasta = window
+    i = index.searchsorted(pd.Timestamp(desde), side='left') if desde else 0
+    j = index.searchsorted(pd.Timestamp(hasta), side='right') if hasta else len(index)
+    return int(i), int(j)
+
+def slice_window(serie, window):
+    """Tramo de la serie dentro de `window` (desde, hasta), sin copiar los datos"""
+    if serie is None or window is None:
+        return serie
+    i, j = window_positions(serie.index, window)
+    return serie.iloc[i:j]
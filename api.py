@@ -0,0 +1,197 @@
+"""API HTTP de solo lectura para clientes automáticos (sin la UI de Streamlit).
+
+    python api.py [--port 8600]
+
+Endpoints:
+    GET /api/catalogo                       índice completo
+    GET /api/buscar?q=&tema=&frecuencia=    búsqueda en el catálogo
+    GET /api/series?ids=A,B&desde=&hasta=   series por ID (formato=json|arrow|csv|parquet, layout=ancha|larga)
+
+Todas las respuestas llevan ETag con la versión del libro y responden 304 a
+If-None-Match; los errores devuelven un JSON {"error": detalle, "status": código}.
+El trabajo pesado corre en un pool de threads. Un BD.xlsx nuevo se carga en
+segundo plano y reemplaza al anterior sin reiniciar el servidor.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import tornado.web
+
+import export
+from catalog import CatalogHolder
+
+ID_HEYMANN = "ITCRB_USA_M"  # Igual que utils.ID_HEYMANN (utils importa Streamlit)
+INDEX_COLUMNS = ['ID', 'Variable', 'Tema', 'Frecuencia', 'Pestaña', 'Fuente']
+
+# formato -> (formato de export.py, mime)
+FORMATOS_API = {
+    "arrow": ("Feather", "application/vnd.apache.arrow.file"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "csv": ("CSV", "text/csv; charset=utf-8"),
+}
+
+logger = logging.getLogger(__name__)
+
+def _records(df):
+    cols = [c for c in INDEX_COLUMNS if c in df.columns]
+    return json.loads(df[cols].to_json(orient="records", force_ascii=False))
+
+class ApiError(tornado.web.HTTPError):
+    """Error con detalle para el cuerpo JSON; la línea de estado lleva la razón estándar"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(status_code)
+        self.detail = detail
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise ApiError(400, f"Fecha inválida: {value}")
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, holder, executor):
+        self.holder = holder
+        self.executor = executor
+
+    def run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def not_modified(self, catalog):
+        """Fija el ETag de la versión y devuelve True si el cliente ya la tiene. Un ETag vale
+        para su URL (query string incluida): ids, fechas, formato y layout ya la distinguen"""
+        etag = f'"{catalog.version}"'
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", "no-cache")
+        if etag in self.request.headers.get("If-None-Match", ""):
+            self.set_status(304)
+            return True
+        return False
+
+    def write_json(self, payload):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.write(json.dumps(payload, ensure_ascii=False, allow_nan=False))
+
+    def write_error(self, status_code, **kwargs):
+        # El detalle (que puede incluir lo que mandó el cliente) va en el cuerpo, nunca en la línea de estado
+        exc = kwargs.get("exc_info", (None, None, None))[1]
+        self.write_json({"error": getattr(exc, "detail", None) or self._reason, "status": status_code})
+
+    def compute_etag(self):
+        # El ETag lo fija not_modified(); se desactiva el hash del cuerpo de tornado
+        return None
+
+class CatalogHandler(BaseHandler):
+    async def get(self):
+        catalog = self.holder.get()
+        if self.not_modified(catalog):
+            return
+        self.write_json({"version": catalog.version, "series": _records(catalog.index)})
+
+class SearchHandler(BaseHandler):
+    async def get(self):
+        catalog = self.holder.get()
+        if self.not_modified(catalog):
+            return
+        facets = {}
+        if self.get_argument("tema", ""):
+            facets['Tema'] = self.get_argument("tema")
+        if self.get_argument("frecuencia", ""):
+            facets['Frecuencia'] = self.get_argument("frecuencia")
+        rows = catalog.search.search(self.get_argument("q", ""), facets)
+        found = catalog.index.iloc[rows]
+        found = found[found['ID'] != ID_HEYMANN]
+        self.write_json({"version": catalog.version, "series": _records(found)})
+
+class SeriesHandler(BaseHandler):
+    async def get(self):
+        ids = [i for i in self.get_argument("ids", "").split(",") if i]
+        if not ids:
+            raise ApiError(400, "Falta el parámetro ids")
+        desde = _parse_date(self.get_argument("desde", ""))
+        hasta = _parse_date(self.get_argument("hasta", ""))
+        formato = self.get_argument("formato", "json")
+        layout = "Larga" if self.get_argument("layout", "ancha") == "larga" else "Ancha"
+        if formato != "json" and formato not in FORMATOS_API:
+            raise ApiError(400, f"Formato desconocido: {formato}")
+
+        catalog = self.holder.get()
+        if self.not_modified(catalog):
+            return
+
+        series = await self.run(self._load, catalog, ids, desde, hasta)
+        missing = [i for i, s in zip(ids, series) if s is None]
+        if missing:
+            raise ApiError(404, f"IDs inexistentes: {', '.join(missing)}")
+
+        if formato == "json":
+            self.write_json({
+                "version": catalog.version,
+                "series": {
+                    s.name: {
+                        "fechas": [d.strftime("%Y-%m-%d") for d in s.index],
+                        "valores": [None if math.isnan(v) else v for v in s.to_numpy().tolist()],
+                    }
+                    for s in series
+                },
+            })
+            return
+
+        # Formatos binarios/CSV: se envía por chunks a medida que se escriben
+        export_fmt, mime = FORMATOS_API[formato]
+        table = await self.run(export.build_table, series, layout)
+        self.set_header("Content-Type", mime)
+        self.set_header("Content-Disposition", f'attachment; filename="series.{export.FORMATOS[export_fmt][0]}"')
+        chunks = export.iter_export(table, export_fmt)
+        while True:
+            chunk = await self.run(next, chunks, None)
+            if chunk is None:
+                break
+            self.write(chunk)
+            await self.flush()
+
+    @staticmethod
+    def _load(catalog, ids, desde, hasta):
+        out = []
+        for var_id in ids:
+            s = catalog.series.get(var_id)
+            if s is not None:
+                # Índice ordenado: .loc con fechas es búsqueda binaria
+                s = s.loc[desde:hasta]
+            out.append(s)
+        return out
+
+def make_app(holder=None, executor=None):
+    if holder is None:
+        holder = CatalogHolder()
+        holder.watch()
+    executor = executor or ThreadPoolExecutor(max_workers=4)
+    args = dict(holder=holder, executor=executor)
+    return tornado.web.Application([
+        (r"/api/catalogo", CatalogHandler, args),
+        (r"/api/buscar", SearchHandler, args),
+        (r"/api/series", SeriesHandler, args),
+    ])
+
+async def serve(port):
+    app = make_app()
+    app.listen(port)
+    logger.info("API de series escuchando en :%s", port)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de Series Macro")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Parseo del libro: secuencial (1 proceso) contra paralelo (ProcessPoolExecutor).
+
+    python benchmarks/bench_parse.py [--scales 1 10] [--workers 4] [--repeat 3] [--json out.json]
+
+Escala 1 es bds/BD.xlsx; las demás son libros sintéticos (benchmarks/synthetic.py).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_cache  # noqa: E402
+import synthetic  # noqa: E402
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return times, result
+
+def bench_workbook(path, workers, repeat):
+    sizes = data_cache.sheet_sizes(path)
+    seq_times, seq = timed(lambda: data_cache.read_sheets(path, workers=1), repeat)
+    # Umbral en 0: se fuerza el modo paralelo aunque el libro sea chico
+    threshold, data_cache.PARALLEL_MIN_BYTES = data_cache.PARALLEL_MIN_BYTES, 0
+    try:
+        par_times, par = timed(lambda: data_cache.read_sheets(path, workers=workers), repeat)
+    finally:
+        data_cache.PARALLEL_MIN_BYTES = threshold
+
+    assert list(seq) == list(par)
+    for name in seq:
+        pd.testing.assert_frame_equal(seq[name], par[name])
+
+    return {
+        "workbook": os.path.basename(path),
+        "sheets": len(sizes),
+        "rows": sum(len(df) for df in seq.values()),
+        "xml_mb": round(sum(sizes.values()) / 2**20, 1),
+        "sequential_s": round(min(seq_times), 3),
+        "parallel_s": round(min(par_times), 3),
+        "speedup": round(min(seq_times) / min(par_times), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default=None, help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        path = data_cache.XLSX_PATH if scale == 1 else synthetic.make_workbook(scale)
+        row = bench_workbook(path, args.workers, args.repeat)
+        row["scale"] = scale
+        results.append(row)
+        print(f"x{scale:<4} {row['sheets']} hojas, {row['rows']} filas, {row['xml_mb']} MB XML: "
+              f"secuencial {row['sequential_s']} s, paralelo ({args.workers}) {row['parallel_s']} s "
+              f"-> x{row['speedup']}")
+
+    if args.json:
+        payload = {
+            "engine": data_cache.excel_engine(), "workers": args.workers, "cpus": os.cpu_count(),
+            "python": platform.python_version(), "pandas": pd.__version__, "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Benchmarks de los caminos calientes, fuera de Streamlit.
+
+    python benchmarks/bench_suite.py [--scales 1 10 100] [--repeat 5] [--json resultados.json]
+    python benchmarks/bench_suite.py --compare base.json nuevo.json
+
+Mide carga (utils.load_catalog / utils.load_all_data), filtro (utils.filter_data),
+el armado del gráfico de view_macro (view_macro.build_chart), la descarga filtrada
+(utils.convert_df_to_excel_filtered) y el camello (view_heymann.plot_heymann_camel),
+sobre bds/BD.xlsx y libros sintéticos escalados (benchmarks/synthetic.py).
+Reporta tiempo de pared (mínimo y mediana), pico de memoria de Python (tracemalloc;
+no incluye las páginas de archivos mapeados) y el tamaño del JSON de las figuras
+Plotly. El JSON resultante se compara entre commits con --compare.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+import pandas as pd  # noqa: E402
+import plotly  # noqa: E402
+import streamlit.logger  # noqa: E402
+
+# Fuera de Streamlit: sin avisos de "No runtime found" al decorar las cachés
+streamlit.logger.set_log_level("error")
+
+import align  # noqa: E402
+import catalog  # noqa: E402
+import data_cache  # noqa: E402
+import kde  # noqa: E402
+import synthetic  # noqa: E402
+import utils  # noqa: E402
+import view_heymann  # noqa: E402
+import view_macro  # noqa: E402
+
+# Búsquedas representativas del Buscador General: (texto, tema, frecuencia)
+CONSULTAS = [
+    ("", "Todos", "Todas"),
+    ("pib", "Todos", "Todas"),
+    ("tipo de cambio", "Todos", "Todas"),
+    ("precios", "Todos", "Mensual"),
+    ("", "Todos", "Diaria"),
+]
+MAX_SERIES_SELECCION = 10
+
+# --- MEDICIÓN ---
+def measure(fn, repeat=3, number=1, memory=True, setup=None):
+    """Tiempos por llamada (mínimo y mediana de `repeat` corridas) y pico de memoria de una corrida extra"""
+    times, result = [], None
+    if setup is None:
+        # Calentamiento: imports perezosos, templates de Plotly, etc.
+        fn()
+    for _ in range(repeat):
+        if setup: setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            result = fn()
+        times.append((time.perf_counter() - t0) / number)
+    out = {"runs": repeat, "wall_s_min": round(min(times), 6), "wall_s_median": round(statistics.median(times), 6)}
+    if memory:
+        if setup: setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            out["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return out, result
+
+def figure_json_kb(fig):
+    return round(len(fig.to_json()) / 1024, 1) if fig is not None else None
+
+# --- ENTORNO ---
+def use_workbook(path, cache_dir):
+    """Apunta utils al libro del benchmark y descarta el catálogo del proceso"""
+    utils.FILE_PATH = path
+    utils.CACHE_DIR = cache_dir
+    reset_catalog()
+
+def reset_catalog():
+    utils._catalog_holder.clear()
+    gc.collect()
+
+def pick_selection(df_index, series_store):
+    """Selecciones fijas: una de frecuencias mezcladas y otra de series diarias"""
+    ids = df_index[df_index['ID'] != utils.ID_HEYMANN].sort_values('ID')
+    mixta = ids.groupby('Frecuencia', sort=True).head(2).head(MAX_SERIES_SELECCION)
+    diarias = ids[ids['Frecuencia'] == 'Diaria'].head(MAX_SERIES_SELECCION)
+    return {"mixta": mixta, "diarias": diarias}
+
+def heymann_series(series_store):
+    """Serie del camello; si el libro no trae la pestaña de Heymann, el ITCRM mensual"""
+    for tab in (utils.SHEET_HEYMANN, "ITCRM M"):
+        frame = series_store.frame(tab)
+        if frame is not None and len(frame.columns):
+            return tab, frame.iloc[:, 0].dropna()
+    return None, None
+
+# --- BENCHMARKS ---
+def bench_scale(scale, repeat, memory):
+    path = data_cache.XLSX_PATH if scale == 1 else synthetic.make_workbook(scale)
+    cache_dir = os.path.join(synthetic.DATA_DIR, f"cache_x{scale}")
+    rows = []
+
+    def add(bench, case, stats, **extra):
+        rows.append({"scale": scale, "workbook": os.path.basename(path), "bench": bench, "case": case, **stats, **extra})
+        peak = f", pico {stats['peak_mb']} MB" if "peak_mb" in stats else ""
+        kb = f", JSON {extra['plotly_json_kb']} KB" if extra.get("plotly_json_kb") is not None else ""
+        print(f"x{scale:<4} {bench:<30} {case:<26} {stats['wall_s_median']:>10.4f} s{peak}{kb}")
+
+    use_workbook(path, cache_dir)
+
+    # Carga: sin caché Parquet (parseo del Excel) y con la caché ya en disco
+    def sin_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        reset_catalog()
+    stats, data_catalog = measure(utils.load_catalog, repeat=1, memory=memory, setup=sin_cache)
+    add("load_catalog", "sin_cache_parquet", stats, series=len(data_catalog.index))
+    stats, _ = measure(utils.load_catalog, repeat=repeat, memory=memory, setup=reset_catalog)
+    add("load_catalog", "cache_parquet", stats)
+    stats, sheets = measure(lambda: utils.load_all_data(utils.load_catalog()), repeat=repeat, memory=memory, setup=reset_catalog)
+    add("load_all_data", "cache_parquet", stats, sheets=len(sheets), rows=sum(len(df) for df in sheets.values()))
+    del sheets, data_catalog
+    reset_catalog()
+
+    data_catalog = utils.load_catalog()
+    df_index, series_store, data_version = data_catalog.index, data_catalog.series, data_catalog.version
+
+    # Filtro del buscador: índice invertido contra str.contains
+    search_index = data_catalog.search
+    def filtrar(index=None):
+        return [utils.filter_data(df_index, *c, search_index=index) for c in CONSULTAS]
+    stats, _ = measure(lambda: filtrar(search_index), repeat=repeat, number=20, memory=memory)
+    add("filter_data", "indice", stats, queries=len(CONSULTAS))
+    stats, _ = measure(filtrar, repeat=repeat, number=20, memory=memory)
+    add("filter_data", "str_contains", stats, queries=len(CONSULTAS))
+
+    # Armado del gráfico (loop de series de view_macro.show)
+    for name, selected in pick_selection(df_index, series_store).items():
+        if selected.empty:
+            continue
+        for full_resolution in (False, True):
+            def armar():
+                state = {k: {} for k in ('axes_config', 'visibility_map', 'color_map', 'chart_type_map', 'transform_map')}
+                return view_macro.build_chart(selected, series_store, state, data_version, full_resolution=full_resolution)[0]
+            case = f"{name}_{'completa' if full_resolution else 'reducida'}"
+            stats, fig = measure(armar, repeat=repeat, memory=memory)
+            add("view_macro.build_chart", case, stats, series=len(selected), plotly_json_kb=figure_json_kb(fig))
+
+        # Ventana de fechas del servidor (último año de la selección)
+        window = align.window_bounds("1 año", view_macro.last_selected_date(selected, data_catalog))
+        def armar_ventana():
+            state = {k: {} for k in ('axes_config', 'visibility_map', 'color_map', 'chart_type_map', 'transform_map')}
+            return view_macro.build_chart(selected, series_store, state, data_version, window=window)[0]
+        stats, fig = measure(armar_ventana, repeat=repeat, memory=memory)
+        add("view_macro.build_chart", f"{name}_ultimo_año", stats, series=len(selected), plotly_json_kb=figure_json_kb(fig))
+
+        # Primer uso: hojas leídas de la caché y normalizadas dentro del loop
+        nuevo = {}
+        def catalogo_nuevo():
+            reset_catalog()
+            nuevo['catalogo'] = utils.load_catalog()
+        def armar_frio():
+            state = {k: {} for k in ('axes_config', 'visibility_map', 'color_map', 'chart_type_map', 'transform_map')}
+            return view_macro.build_chart(selected, nuevo['catalogo'].series, state, data_version)[0]
+        stats, _ = measure(armar_frio, repeat=repeat, memory=memory, setup=catalogo_nuevo)
+        add("view_macro.build_chart", f"{name}_primer_uso", stats, series=len(selected))
+        data_catalog = nuevo.pop('catalogo')
+        series_store = data_catalog.series
+
+        stats, data = measure(lambda: utils.convert_df_to_excel_filtered(selected, series_store), repeat=repeat, memory=memory)
+        add("convert_df_to_excel_filtered", name, stats, series=len(selected), bytes=len(data))
+        stats, data = measure(lambda: utils.convert_df_to_excel_filtered(selected, series_store, window=window), repeat=repeat, memory=memory)
+        add("convert_df_to_excel_filtered", f"{name}_ultimo_año", stats, series=len(selected), bytes=len(data))
+
+    # Camello de Heymann (matplotlib) y su versión interactiva (Plotly)
+    tab, serie = heymann_series(series_store)
+    if serie is not None:
+        # Incluye la KDE binneada (sin la caché de load_binned_kde)
+        stats, _ = measure(lambda: view_heymann.plot_heymann_camel(kde.BinnedKDE(serie), view_heymann.PERIODOS), repeat=repeat, memory=memory)
+        add("plot_heymann_camel", "kde_y_figura", stats, sheet=tab, points=len(serie))
+        stats, fig = measure(
+            lambda: view_heymann.build_camel_figure(kde.BinnedKDE(serie), view_heymann.PERIODOS),
+            repeat=repeat, memory=memory,
+        )
+        add("build_camel_figure", "tres_periodos", stats, sheet=tab, points=len(serie), plotly_json_kb=figure_json_kb(fig))
+
+    reset_catalog()
+    return rows
+
+# --- COMPARACIÓN ---
+def compare(base_path, new_path):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    key = lambda r: (r["scale"], r["bench"], r["case"])
+    old = {key(r): r for r in base["results"]}
+    print(f"{base['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    print(f"{'escala':<7}{'benchmark':<31}{'caso':<27}{'tiempo':>10}{'memoria':>10}{'JSON':>10}")
+    for r in new["results"]:
+        o = old.get(key(r))
+        if o is None:
+            continue
+        def ratio(field):
+            a, b = o.get(field), r.get(field)
+            return f"x{b / a:.2f}" if a and b is not None else "-"
+        print(f"x{r['scale']:<6}{r['bench']:<31}{r['case']:<27}{ratio('wall_s_median'):>10}{ratio('peak_mb'):>10}{ratio('plotly_json_kb'):>10}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="No medir el pico de memoria (evita la corrida extra con tracemalloc)")
+    parser.add_argument("--json", default=None, help="Guardar los resultados en este archivo")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"), help="Comparar dos resultados guardados")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # Sin watcher del Excel: cada benchmark arma su propio catálogo
+    catalog.CatalogHolder.watch = lambda self: False
+
+    results = []
+    for scale in args.scales:
+        results.extend(bench_scale(scale, args.repeat, not args.no_memory))
+
+    if args.json:
+        payload = {
+            "meta": {
+                "commit": git_commit(), "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(), "pandas": pd.__version__, "plotly": plotly.__version__,
+                "engine": data_cache.excel_engine(), "cpus": os.cpu_count(), "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=1, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
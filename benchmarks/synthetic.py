@@ -0,0 +1,78 @@
+"""Libros sintéticos N veces más grandes que bds/BD.xlsx, para benchmarks.
+
+Cada hoja de datos se repite N veces hacia atrás en el tiempo (fechas distintas,
+mismos valores), así las series normalizadas también crecen N veces. La hoja
+'Referencias' se copia tal cual.
+
+    python benchmarks/synthetic.py --scale 10
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_cache  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+
+def scale_sheet(df, scale):
+    """Hoja con `scale` copias de sus filas, cada una desplazada antes de la anterior"""
+    if scale <= 1 or df.empty:
+        return df
+    date_col = df.columns[0]
+    fechas = pd.to_datetime(df[date_col], errors='coerce')
+    valid = fechas.notna()
+    if not valid.any():
+        return df
+    step = fechas[valid].sort_values().diff().median()
+    if pd.isna(step) or step <= pd.Timedelta(0):
+        step = pd.Timedelta(days=1)
+    span = fechas[valid].max() - fechas[valid].min() + step
+
+    parts = []
+    for k in range(scale - 1, 0, -1):
+        copy = df[valid].copy()
+        copy[date_col] = (fechas[valid] - k * span).dt.strftime('%Y-%m-%d')
+        parts.append(copy)
+    parts.append(df)
+    return pd.concat(parts, ignore_index=True)
+
+def write_workbook(sheets, dst):
+    # write_only: el libro se escribe fila a fila sin armarlo entero en memoria
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(title=name)
+        ws.append([str(c) for c in df.columns])
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+            ws.append(list(row))
+    wb.save(dst)
+
+def make_workbook(scale, src=data_cache.XLSX_PATH, dst=None):
+    """Ruta al libro sintético (se genera una sola vez por escala y fuente)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if dst is None:
+        version = data_cache.file_sha256(src)[:8]
+        dst = os.path.join(DATA_DIR, f"BD_x{scale}_{version}.xlsx")
+    if os.path.exists(dst):
+        return dst
+    sheets = data_cache.read_sheets(src)
+    first = next(iter(sheets))
+    scaled = {name: df if name == first else scale_sheet(df, scale) for name, df in sheets.items()}
+    tmp = dst + ".tmp"
+    write_workbook(scaled, tmp)
+    os.replace(tmp, dst)
+    return dst
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un libro sintético escalado a partir de bds/BD.xlsx")
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--xlsx", default=data_cache.XLSX_PATH)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    print(make_workbook(args.scale, args.xlsx, args.out))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Foto inmutable de una versión del libro, sin dependencia de Streamlit."""
+import logging
+import os
+import threading
+import time
+import zipfile
+
+import data_cache
+import summary
+from search_index import SearchIndex
+from series_store import SeriesStore
+from sheet_store import DEFAULT_MAX_BYTES, SheetStore
+
+SETTLE_SECONDS = 1.0  # El Excel tiene que quedar quieto este tiempo antes de recargarlo
+
+logger = logging.getLogger(__name__)
+
+class Catalog:
+    """Índice, hojas perezosas, series normalizadas y buscador de una misma versión.
+
+    Se crea una sola instancia por proceso y versión, compartida por todas las
+    sesiones: nada de lo que expone debe modificarse.
+    """
+
+    def __init__(self, version, df_index, sheets, max_bytes=DEFAULT_MAX_BYTES, fingerprints=None, dtype='float64', summaries=None):
+        self.version = version
+        self.index = df_index
+        self.sheets = sheets
+        self.fingerprints = fingerprints or {}
+        # Resumen por ID (rango, extremos, sparkline) sin cargar las series; vacío sin caché
+        self.summary = summary.summary_table(df_index, summaries or {})
+        # El presupuesto se reparte entre hojas crudas y normalizadas
+        self.series = SeriesStore(df_index, sheets, max_bytes=max_bytes, dtype=dtype)
+        self.search = SearchIndex(df_index)
+
+    def stats(self):
+        """Hits/misses y memoria de los LRU (hojas crudas y normalizadas)"""
+        return {"version": self.version, "sheets": self.sheets.stats(), "series": self.series.stats()}
+
+    def adopt(self, previous):
+        """Trae de `previous` las hojas ya cargadas cuya huella no cambió"""
+        same = {
+            name for name, fp in self.fingerprints.items()
+            if fp is not None and previous.fingerprints.get(name) == fp
+        }
+        self.sheets.adopt(previous.sheets, same)
+        self.series.adopt(previous.series, same)
+        return same
+
+def load_catalog(path=data_cache.XLSX_PATH, cache_dir=data_cache.CACHE_DIR, max_bytes=2 * DEFAULT_MAX_BYTES, mmap=True, previous=None, dtype='float64'):
+    """Catálogo de la versión vigente; si la caché no se puede usar, lee el Excel directamente.
+    Con `previous`, las hojas sin cambios ya cargadas en memoria pasan al catálogo nuevo"""
+    try:
+        manifest = data_cache.ensure_cache(path, cache_dir)
+    except Exception:
+        logger.exception("No se pudo usar la caché Parquet/Arrow; se lee el Excel")
+        manifest = None
+
+    fingerprints = summaries = None
+    if manifest is not None:
+        version = manifest['version']
+        fingerprints = data_cache.sheet_fingerprint_map(manifest)
+        summaries = data_cache.sheet_summary_map(manifest)
+        sheets = SheetStore.from_cache(manifest, cache_dir, max_bytes=max_bytes // 2, mmap=mmap)
+    else:
+        stat = data_cache.workbook_stat(path)
+        version = f"{stat['mtime_ns']}-{stat['size']}"
+        sheets = SheetStore.from_excel(path, max_bytes=max_bytes // 2)
+
+    df_index = sheets[next(iter(sheets))].copy()
+    df_index['ID'] = df_index['ID'].astype(str)
+    catalog = Catalog(version, df_index, sheets, max_bytes=max_bytes // 2, fingerprints=fingerprints, dtype=dtype, summaries=summaries)
+    if previous is not None:
+        catalog.adopt(previous)
+    return catalog
+
+class CatalogHolder:
+    """Catálogo vigente de un proceso. Cuando cambia el Excel, el nuevo se arma en un
+    thread de fondo (reparseando sólo las hojas modificadas) y se publica de una vez;
+    mientras tanto se sigue sirviendo el anterior.
+
+    `watch()` avisa del cambio apenas se escribe el archivo (watchdog). Sin watcher,
+    `get()` compara mtime/tamaño en cada llamada y dispara la misma recarga.
+    """
+
+    def __init__(self, path=data_cache.XLSX_PATH, cache_dir=data_cache.CACHE_DIR, settle=SETTLE_SECONDS, **options):
+        self._path = path
+        self._cache_dir = cache_dir
+        self._settle = settle
+        self._options = options
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._observer = None
+        self._stat = data_cache.workbook_stat(path)
+        self._catalog = load_catalog(path, cache_dir, **options)
+
+    def get(self):
+        try:
+            changed = data_cache.workbook_stat(self._path) != self._stat
+        except OSError:
+            # El archivo se está reemplazando
+            changed = False
+        if changed:
+            self.reload_async()
+        return self._catalog
+
+    def reload_async(self):
+        """Programa una recarga en segundo plano (una sola a la vez)"""
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="catalog-reload", daemon=True).start()
+
+    def _wait_settled(self):
+        # Espera a que la copia del Excel termine: stat estable y zip legible
+        last = None
+        while True:
+            try:
+                stat = data_cache.workbook_stat(self._path)
+            except OSError:
+                stat = None
+            if stat is not None and stat == last and zipfile.is_zipfile(self._path):
+                return stat
+            last = stat
+            time.sleep(self._settle)
+
+    def _reload(self):
+        try:
+            stat = self._wait_settled()
+            while stat != self._stat:
+                try:
+                    catalog = load_catalog(self._path, self._cache_dir, previous=self._catalog, **self._options)
+                except Exception:
+                    logger.exception("No se pudo recargar %s; se sigue sirviendo la versión %s", self._path, self._catalog.version)
+                else:
+                    # Publicación atómica: cada lector ve el catálogo viejo o el nuevo, nunca una mezcla
+                    self._catalog = catalog
+                    logger.info("Catálogo recargado: versión %s", catalog.version)
+                self._stat = stat
+                # Si el archivo volvió a cambiar durante la recarga, se repite
+                stat = self._wait_settled()
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def watch(self):
+        """Observa la carpeta del Excel con watchdog; si no está disponible queda el sondeo de get()"""
+        if self._observer is not None:
+            return True
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning("watchdog no está instalado; los cambios del Excel se detectan al consultar")
+            return False
+
+        target = os.path.abspath(self._path)
+        holder = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = (event.src_path, getattr(event, "dest_path", ""))
+                if any(p and os.path.abspath(p) == target for p in paths):
+                    holder.reload_async()
+
+        observer = Observer()
+        observer.schedule(_Handler(), os.path.dirname(target) or ".", recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        return True
+
+def memory_budget_from_env(default_mb=512):
+    """Presupuesto total (bytes) desde SERIESMACRO_MEMORIA_MB"""
+    return int(os.environ.get("SERIESMACRO_MEMORIA_MB", default_mb)) << 20
@@ -0,0 +1,422 @@
+"""Caché columnar (Parquet) de bds/BD.xlsx.
+
+El Excel sigue siendo la fuente de verdad: cada hoja se convierte una única vez
+a Parquet y se reutiliza mientras el libro no cambie (mtime + tamaño, y sha256
+como desempate). Junto a cada Parquet se escribe un Arrow IPC sin comprimir que
+se puede leer con memory-map, así varios procesos comparten las mismas páginas.
+Cada hoja guarda una huella de su contenido: al cambiar el libro sólo se vuelven
+a parsear las hojas cuya huella cambió. Uso como paso de build:
+
+    python data_cache.py [--force]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import uuid
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# --- CONFIGURACIÓN ---
+XLSX_PATH = 'bds/BD.xlsx'
+CACHE_DIR = 'bds/.cache'
+MANIFEST_NAME = 'manifest.json'
+CACHE_FORMAT = 3
+# Parseo en paralelo sólo a pedido (cada worker de Streamlit levantaría su propio pool al arrancar
+# y en cada recarga). No hay un cruce medido en una máquina con varios núcleos: quien lo active
+# debería medirlo con benchmarks/bench_parse.py en el servidor
+PARSE_WORKERS = max(1, min(int(os.environ.get("SERIESMACRO_WORKERS", 1)), os.cpu_count() or 1))  # Procesos para parsear hojas
+# Sólo evita levantar procesos para libros chicos; no es un umbral medido
+PARALLEL_MIN_BYTES = int(os.environ.get("SERIESMACRO_PARALELO_MB", 8)) << 20  # XML por debajo del cual se parsea secuencial
+
+logger = logging.getLogger(__name__)
+
+# --- HUELLA DEL LIBRO ---
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def workbook_stat(path=XLSX_PATH):
+    st_ = os.stat(path)
+    return {"mtime_ns": st_.st_mtime_ns, "size": st_.st_size}
+
+# --- HUELLA POR HOJA ---
+_NS = {
+    "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_RE_SHARED = re.compile(rb'<c\b[^>]*?\bt="s"[^>]*>\s*<v>(\d+)</v>')
+_RE_STYLE = re.compile(rb'<c\b[^>]*?\bs="(\d+)"')
+
+def _zip_path(target):
+    return target.lstrip("/") if target.startswith("/") else "xl/" + target
+
+def _shared_strings(zf):
+    try:
+        data = zf.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    t_tag = f"{{{_NS['m']}}}t"
+    return ["".join(t.text or "" for t in si.iter(t_tag)) for si in ET.fromstring(data)]
+
+def _cell_formats(zf):
+    """Código de formato numérico de cada estilo de celda (define qué números son fechas)"""
+    try:
+        root = ET.fromstring(zf.read("xl/styles.xml"))
+    except KeyError:
+        return []
+    codes = {f.get("numFmtId"): f.get("formatCode") for f in root.iterfind("m:numFmts/m:numFmt", _NS)}
+    return [
+        f"{xf.get('numFmtId')}:{codes.get(xf.get('numFmtId'), '')}"
+        for xf in root.iterfind("m:cellXfs/m:xf", _NS)
+    ]
+
+def _sheet_members(zf, workbook):
+    """[(hoja, archivo XML dentro del zip)] en el orden del libro"""
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): _zip_path(r.get("Target")) for r in rels.iterfind("rel:Relationship", _NS)}
+    return [
+        (sheet.get("name"), targets[sheet.get(f"{{{_NS['r']}}}id")])
+        for sheet in workbook.iterfind("m:sheets/m:sheet", _NS)
+    ]
+
+def sheet_sizes(path=XLSX_PATH):
+    """{hoja: bytes de XML sin comprimir}, en el orden del libro"""
+    with zipfile.ZipFile(path) as zf:
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+        return {name: zf.getinfo(member).file_size for name, member in _sheet_members(zf, workbook)}
+
+def sheet_fingerprints(path=XLSX_PATH):
+    """{hoja: sha256} del XML de cada hoja más los textos compartidos y formatos que usa.
+
+    No parsea celdas: cuesta una fracción de pd.read_excel y permite detectar
+    qué hojas cambiaron entre dos versiones del libro."""
+    with zipfile.ZipFile(path) as zf:
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+        pr = workbook.find("m:workbookPr", _NS)
+        date1904 = pr is not None and pr.get("date1904") in ("1", "true")
+        strings = _shared_strings(zf)
+        formats = _cell_formats(zf)
+
+        out = {}
+        for name, member in _sheet_members(zf, workbook):
+            data = zf.read(member)
+            h = hashlib.sha256(b"1904" if date1904 else b"1900")
+            h.update(data)
+            for idx in _RE_SHARED.findall(data):
+                h.update(b"\0" + strings[int(idx)].encode("utf-8"))
+            for idx in sorted({int(i) for i in _RE_STYLE.findall(data)}):
+                if idx < len(formats):
+                    h.update(b"\1" + formats[idx].encode("utf-8"))
+            out[name] = h.hexdigest()
+    return out
+
+# --- PARSEO (SECUENCIAL O EN PARALELO) ---
+def excel_engine():
+    """Motor de pd.read_excel: calamine si está instalado (más rápido), si no openpyxl en modo read-only"""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return "openpyxl"
+    return "calamine"
+
+def _parse_chunk(path, names, engine):
+    return pd.read_excel(path, sheet_name=names, engine=engine)
+
+def _balanced_chunks(names, sizes, n):
+    """Reparte las hojas en n grupos de tamaño parecido (la más grande primero al grupo más liviano)"""
+    bins = [[] for _ in range(n)]
+    loads = [0] * n
+    for name in sorted(names, key=lambda x: sizes.get(x, 0), reverse=True):
+        i = loads.index(min(loads))
+        bins[i].append(name)
+        loads[i] += sizes.get(name, 0)
+    return [b for b in bins if b]
+
+def read_sheets(path=XLSX_PATH, names=None, workers=None):
+    """{hoja: DataFrame} como pd.read_excel(sheet_name=None), repartiendo las hojas entre
+    `workers` procesos cuando el libro es lo bastante grande para que valga la pena"""
+    engine = excel_engine()
+    sizes = sheet_sizes(path)
+    names = list(sizes) if names is None else list(names)
+    if not names:
+        return {}
+    workers = min(PARSE_WORKERS if workers is None else workers, len(names))
+    if workers <= 1 or sum(sizes.get(n, 0) for n in names) < PARALLEL_MIN_BYTES:
+        return pd.read_excel(path, sheet_name=names, engine=engine)
+
+    chunks = _balanced_chunks(names, sizes, workers)
+    # spawn: los servidores (Streamlit, tornado) tienen threads y fork no es seguro
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        parsed = {}
+        for part in pool.map(_parse_chunk, repeat(path), chunks, repeat(engine)):
+            parsed.update(part)
+    return {name: parsed[name] for name in names}
+
+# --- MANIFIESTO ---
+def read_manifest(cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != CACHE_FORMAT or "dir" not in manifest:
+        return None
+    if not os.path.isdir(os.path.join(cache_dir, manifest["dir"])):
+        return None
+    return manifest
+
+def _write_manifest(manifest, cache_dir):
+    # Escritura atómica: otros procesos nunca ven un manifiesto a medias
+    tmp = os.path.join(cache_dir, f".{MANIFEST_NAME}.{uuid.uuid4().hex}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, MANIFEST_NAME))
+
+def is_fresh(manifest, path=XLSX_PATH, cache_dir=CACHE_DIR):
+    """True si el manifiesto corresponde a la versión actual del Excel"""
+    if manifest is None:
+        return False
+    stat = workbook_stat(path)
+    if stat["mtime_ns"] == manifest["mtime_ns"] and stat["size"] == manifest["size"]:
+        return True
+    if stat["size"] != manifest["size"]:
+        return False
+    # Mismo tamaño, otro mtime (ej. checkout de git): decide el hash
+    if file_sha256(path) != manifest["sha256"]:
+        return False
+    manifest.update(stat)
+    try:
+        _write_manifest(manifest, cache_dir)
+    except OSError:
+        pass
+    return True
+
+# --- CONVERSIÓN ---
+def _to_storable(df):
+    """Adapta una hoja para Parquet. Devuelve (df, columnas mixtas texto/número)"""
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    mixed = []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+            df[col] = pd.to_numeric(df[col])
+        elif kind not in ('string', 'empty', 'boolean', 'datetime', 'datetime64', 'date'):
+            # Ej. números con "s/d": se guardan como texto y se restauran al leer
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+            mixed.append(col)
+    return df, mixed
+
+def _parse_cell(v):
+    if not isinstance(v, str):
+        return v
+    for cast in (int, float):
+        try:
+            return cast(v)
+        except ValueError:
+            pass
+    return v
+
+def _restore_mixed(df, mixed):
+    for col in mixed:
+        if col in df.columns:
+            df[col] = df[col].astype(object).map(_parse_cell)
+    return df
+
+def _nan_for_null(table):
+    """Nulos -> NaN en columnas float: sin bitmap de validez, to_pandas no necesita copiar"""
+    columns = [
+        pc.fill_null(col, np.nan) if pa.types.is_floating(col.type) else col
+        for col in table.columns
+    ]
+    return pa.Table.from_arrays(columns, schema=table.schema)
+
+def _write_sheet(df, tmp_dir, file_name, arrow_name):
+    """Escribe la hoja en Parquet y Arrow IPC. Devuelve las columnas mixtas"""
+    storable, mixed = _to_storable(df)
+    table = pa.Table.from_pandas(storable, preserve_index=False)
+    pq.write_table(table, os.path.join(tmp_dir, file_name))
+    with pa.OSFile(os.path.join(tmp_dir, arrow_name), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(_nan_for_null(table))
+    return mixed
+
+def _link_or_copy(src, dst):
+    # Los archivos de una versión no se modifican: un hardlink basta
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def build_cache(path=XLSX_PATH, cache_dir=CACHE_DIR, previous=None, workers=None, force=False):
+    """Escribe una versión nueva de la caché. Las hojas con la misma huella que en
+    `previous` (manifiesto anterior) se reutilizan sin volver a parsear el Excel.
+    Con `force` reemplaza el directorio de la versión aunque ya exista (caché dañada)"""
+    stat = workbook_stat(path)
+    sha = file_sha256(path)
+    version = sha[:16]
+    # El directorio incluye el formato: una caché vieja del mismo Excel no se reutiliza
+    dir_name = f"{version}-f{CACHE_FORMAT}"
+    os.makedirs(cache_dir, exist_ok=True)
+
+    try:
+        fingerprints = sheet_fingerprints(path)
+    except Exception:
+        logger.exception("No se pudieron calcular las huellas por hoja; se parsea el libro completo")
+        fingerprints = None
+
+    reusable = {}
+    if fingerprints and previous is not None:
+        previous_dir = os.path.join(cache_dir, previous["dir"])
+        for entry in previous["sheets"]:
+            fp = entry.get("fingerprint")
+            if fp is not None and fingerprints.get(entry["name"]) == fp and os.path.isdir(previous_dir):
+                reusable[entry["name"]] = entry
+
+    if fingerprints is None:
+        sheets = read_sheets(path, workers=workers)
+        names = list(sheets)
+    else:
+        names = list(fingerprints)
+        sheets = read_sheets(path, [name for name in names if name not in reusable], workers=workers)
+    logger.info("Caché %s: %d hojas parseadas, %d reutilizadas", version, len(sheets), len(reusable))
+
+    # Importado acá: summary usa series_store, que a su vez importa este módulo
+    import summary
+
+    tmp_dir = os.path.join(cache_dir, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+    entries = []
+    try:
+        for i, name in enumerate(names):
+            file_name = f"hoja_{i:03d}.parquet"
+            arrow_name = f"hoja_{i:03d}.arrow"
+            if name in reusable:
+                old = reusable[name]
+                _link_or_copy(os.path.join(previous_dir, old["file"]), os.path.join(tmp_dir, file_name))
+                _link_or_copy(os.path.join(previous_dir, old["arrow"]), os.path.join(tmp_dir, arrow_name))
+                rows, mixed, resumen = old["rows"], old["mixed_columns"], old.get("summary")
+            else:
+                df = sheets[name]
+                mixed = _write_sheet(df, tmp_dir, file_name, arrow_name)
+                rows = len(df)
+                resumen = None
+                if i > 0:
+                    # La primera hoja es el índice; las demás son series
+                    try:
+                        resumen = summary.sheet_summary(df)
+                    except Exception:
+                        logger.exception("No se pudo resumir la hoja %s", name)
+            entries.append({
+                "name": name, "file": file_name, "arrow": arrow_name, "rows": rows, "mixed_columns": mixed,
+                "fingerprint": fingerprints[name] if fingerprints else None, "summary": resumen,
+            })
+
+        version_dir = os.path.join(cache_dir, dir_name)
+        if os.path.isdir(version_dir) and force:
+            # El directorio viejo se aparta primero: los procesos que tienen sus archivos
+            # abiertos (o mapeados) los siguen leyendo hasta cerrarlos
+            old_dir = os.path.join(cache_dir, f".old-{uuid.uuid4().hex}")
+            os.rename(version_dir, old_dir)
+            os.rename(tmp_dir, version_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        elif os.path.isdir(version_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            try:
+                os.rename(tmp_dir, version_dir)
+            except OSError:
+                # Otro proceso publicó la misma versión en paralelo
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    manifest = {
+        "format": CACHE_FORMAT, "source": path, "sha256": sha,
+        "version": version, "dir": dir_name, "sheets": entries, **stat,
+    }
+    current = read_manifest(cache_dir)
+    _write_manifest(manifest, cache_dir)
+    _prune_versions(cache_dir, keep={dir_name, current["dir"] if current else None})
+    return manifest
+
+def _prune_versions(cache_dir, keep):
+    # Se conserva la versión anterior por si algún proceso todavía la está leyendo
+    for entry in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, entry)
+        if os.path.isdir(full) and not entry.startswith(".") and entry not in keep:
+            shutil.rmtree(full, ignore_errors=True)
+
+def ensure_cache(path=XLSX_PATH, cache_dir=CACHE_DIR, workers=None):
+    """Devuelve el manifiesto vigente, reconstruyendo la caché si el Excel cambió"""
+    manifest = read_manifest(cache_dir)
+    if is_fresh(manifest, path, cache_dir):
+        return manifest
+    return build_cache(path, cache_dir, previous=manifest, workers=workers)
+
+# --- LECTURA ---
+def sheet_names(manifest):
+    return [s["name"] for s in manifest["sheets"]]
+
+def read_sheet(manifest, name, cache_dir=CACHE_DIR, mmap=False):
+    """Hoja desde la caché. Con mmap=True las columnas numéricas apuntan (sin copia y
+    de solo lectura) al archivo Arrow mapeado, compartido con los demás procesos"""
+    entry = next((s for s in manifest["sheets"] if s["name"] == name), None)
+    if entry is None:
+        raise KeyError(name)
+    version_dir = os.path.join(cache_dir, manifest["dir"])
+    if mmap:
+        # El mapeo queda vivo mientras algún array lo referencie
+        source = pa.memory_map(os.path.join(version_dir, entry["arrow"]))
+        df = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+    else:
+        df = pq.read_table(os.path.join(version_dir, entry["file"])).to_pandas()
+    return _restore_mixed(df, entry["mixed_columns"])
+
+def sheet_fingerprint_map(manifest):
+    """{hoja: huella} del manifiesto (None si la versión se escribió sin huellas)"""
+    return {s["name"]: s.get("fingerprint") for s in manifest["sheets"]}
+
+def sheet_summary_map(manifest):
+    """{hoja: {variable: resumen}} calculado al armar la caché"""
+    return {s["name"]: s["summary"] for s in manifest["sheets"] if s.get("summary")}
+
+# --- BUILD (CLI) ---
+def main():
+    parser = argparse.ArgumentParser(description="Convierte bds/BD.xlsx a la caché Parquet")
+    parser.add_argument("--xlsx", default=XLSX_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Reconstruir aunque el Excel no haya cambiado")
+    parser.add_argument("--workers", type=int, default=None, help=f"Procesos para parsear hojas (por defecto {PARSE_WORKERS})")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.force:
+        manifest = build_cache(args.xlsx, args.cache_dir, workers=args.workers, force=True)
+    else:
+        manifest = ensure_cache(args.xlsx, args.cache_dir, workers=args.workers)
+    print(f"Caché {manifest['version']}: {len(manifest['sheets'])} hojas en {args.cache_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Reducción de puntos por traza (LTTB y min/max por bucket) antes de enviar al navegador."""
+import numpy as np
+import pandas as pd
+
+# Con ~1 punto por píxel horizontal el trazo es indistinguible del original
+ANCHO_GRAFICO_PX = 1400
+
+def _clean(serie):
+    serie = serie.dropna()
+    x = serie.index.asi8.astype("float64") if isinstance(serie.index, pd.DatetimeIndex) else np.arange(len(serie), dtype="float64")
+    return serie, x, serie.to_numpy(dtype="float64")
+
+def lttb_indices(x, y, n_out):
+    """Posiciones elegidas por Largest-Triangle-Three-Buckets (incluye primera y última)"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Límites de los buckets (ninguno vacío porque n_out < n); el último es sólo el punto final
+    bounds = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    sizes = np.diff(bounds)
+    # Promedio de cada bucket (tercer vértice del triángulo del bucket anterior), todos de una vez
+    avg_x = np.add.reduceat(x, bounds[:-1]) / sizes
+    avg_y = np.add.reduceat(y, bounds[:-1]) / sizes
+    # Buckets como matriz: cada paso es una fila. Los más cortos se rellenan repitiendo su
+    # primer punto, que empata con el original y argmax se queda con el primero
+    starts = bounds[:-2]
+    cols = np.arange(sizes[:-1].max())
+    pos = np.where(cols < sizes[:-1, None], starts[:, None] + cols, starts[:, None])
+    bx, by = x[pos], y[pos]
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    # El punto elegido depende del anterior: sólo este recorrido queda secuencial
+    for i in range(n_out - 2):
+        ax, ay, cx, cy = x[prev], y[prev], avg_x[i + 1], avg_y[i + 1]
+        area = np.abs((ax - cx) * (by[i] - ay) - (ax - bx[i]) * (cy - ay))
+        prev = starts[i] + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+def minmax_indices(y, n_out):
+    """Mínimo y máximo de cada bucket: conserva todos los picos y valles"""
+    n = len(y)
+    n_buckets = max((n_out - 2) // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+    starts = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    # Posición del extremo dentro de cada bucket
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+    pos = np.arange(n)
+    first_min = np.full(n_buckets, n)
+    first_max = np.full(n_buckets, n)
+    np.minimum.at(first_min, bucket[y == mins[bucket]], pos[y == mins[bucket]])
+    np.minimum.at(first_max, bucket[y == maxs[bucket]], pos[y == maxs[bucket]])
+    return np.unique(np.concatenate([first_min, first_max, [0, n - 1]]))
+
+def downsample(serie, max_points=ANCHO_GRAFICO_PX, method="lttb"):
+    """Serie reducida a lo sumo a `max_points` puntos (sin NaN; los huecos se unen igual con connectgaps)"""
+    serie, x, y = _clean(serie)
+    if len(serie) <= max_points:
+        return serie
+    if method == "minmax":
+        idx = minmax_indices(y, max_points)
+    else:
+        idx = lttb_indices(x, y, max_points)
+    return serie.iloc[idx]
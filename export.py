@@ -0,0 +1,97 @@
+"""Exportación rápida de series (CSV / Parquet / Feather) en tabla ancha o larga, por chunks."""
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import align
+
+CHUNK_ROWS = 50_000
+
+# Formato -> (extensión, mime)
+FORMATOS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Feather": ("feather", "application/vnd.apache.arrow.file"),
+}
+LAYOUTS = ("Ancha", "Larga")
+
+# --- TABLAS ---
+def wide_table(series):
+    """Una columna por ID sobre el índice unión de fechas"""
+    return align.align_series(series).rename_axis('Fecha').reset_index()
+
+def long_table(series):
+    """Formato (ID, Fecha, Valor), sin filas vacías"""
+    parts = [
+        pd.DataFrame({'ID': s.name, 'Fecha': s.index, 'Valor': s.to_numpy()})
+        for s in series if s is not None
+    ]
+    if not parts:
+        return pd.DataFrame({'ID': pd.Series(dtype=str), 'Fecha': pd.Series(dtype='datetime64[ns]'), 'Valor': pd.Series(dtype='float64')})
+    out = pd.concat(parts, ignore_index=True)
+    return out[out['Valor'].notna()].reset_index(drop=True)
+
+def build_table(series, layout="Ancha"):
+    if layout == "Larga":
+        return long_table(series)
+    return wide_table(series)
+
+# --- ESCRITURA POR CHUNKS ---
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura que acumula bytes hasta que se los drena (tell() sigue contando)"""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _iter_csv(df, chunk_rows):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=(start == 0), date_format='%Y-%m-%d').encode("utf-8")
+
+def _iter_arrow(df, chunk_rows, fmt):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = _ChunkSink()
+    if fmt == "Parquet":
+        writer = pq.ParquetWriter(sink, table.schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_file(sink, table.schema)
+        write = writer.write_table
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        write(pa.Table.from_batches([batch], schema=table.schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+def iter_export(df, fmt="CSV", chunk_rows=CHUNK_ROWS):
+    """Genera el archivo exportado de a chunks de bytes (respuestas HTTP de la API; export_bytes los junta)"""
+    if fmt == "CSV":
+        return _iter_csv(df, chunk_rows)
+    if fmt in ("Parquet", "Feather"):
+        return _iter_arrow(df, chunk_rows, fmt)
+    raise ValueError(f"Formato desconocido: {fmt}")
+
+def export_bytes(df, fmt="CSV"):
+    # st.download_button necesita el archivo completo en memoria
+    return b"".join(iter_export(df, fmt))
@@ -1,12 +1,12 @@
 import streamlit as st
+import pandas as pd
 import locale
-from PIL import Image
-import os
 
 # Importamos nuestros nuevos módulos
+# (las vistas se importan recién al mostrarlas: plotly, kde, etc. no demoran el arranque)
 import utils
-import view_macro
-import view_heymann
+import perf
+import share
 
 # Configuración Locale
 try:
@@ -18,14 +18,7 @@ except:
         pass
 
 # --- CONFIGURACIÓN DE PÁGINA ---
-page_icon = None
-if os.path.exists(utils.LOGO_PATH):
-    try:
-        img = Image.open(utils.LOGO_PATH).convert("RGBA")
-        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
-        page_icon = Image.alpha_composite(background, img)
-    except:
-        pass
+page_icon, logo_b64 = utils.get_logo_assets()
 
 st.set_page_config(
     layout="wide", 
@@ -33,17 +26,52 @@ st.set_page_config(
     page_icon=page_icon
 )
 
+# --- PANEL DE RENDIMIENTO ---
+def show_perf_sidebar():
+    """Etapas, contadores y payloads de las últimas pasadas de la sesión (opt-in)"""
+    historial = st.session_state.get('_perf_historial', [])
+    if not historial:
+        return
+    ultima = historial[-1]
+    with st.sidebar:
+        st.markdown("### Rendimiento")
+        st.metric("Última pasada", f"{ultima['total_ms']:,.0f} ms")
+        st.dataframe(pd.DataFrame(list(ultima['etapas'].items()), columns=["Etapa", "ms"]), hide_index=True, width="stretch")
+        if ultima['contadores']:
+            st.markdown("**Cachés**")
+            st.dataframe(pd.DataFrame(list(ultima['contadores'].items()), columns=["Contador", "Δ"]), hide_index=True, width="stretch")
+        if ultima['payloads']:
+            st.markdown("**Payloads**")
+            st.dataframe(pd.DataFrame([(k, v / 1024) for k, v in ultima['payloads'].items()], columns=["Elemento", "KB"]), hide_index=True, width="stretch")
+        # Los fragmentos (leyenda, descargas) se re-ejecutan solos: aparecen acá recién en el próximo rerun completo
+        st.markdown("**Historial**")
+        st.dataframe(pd.DataFrame([{"Pasada": r['pasada'], "ms": r['total_ms']} for r in reversed(historial)]), hide_index=True, width="stretch")
+        descargas = st.session_state.get('_perf_descargas', [])
+        if descargas:
+            st.markdown("**Descargas generadas**")
+            st.dataframe(pd.DataFrame([{"Descarga": d['descarga'], "KB": d['bytes'] / 1024, "ms": d['ms']} for d in reversed(descargas)]), hide_index=True, width="stretch")
+
 # --- MAIN ---
 def main():
+    with utils.perf_run("rerun"):
+        render_page()
+    if utils.perf_enabled():
+        show_perf_sidebar()
+
+def render_page():
     if 'view' not in st.session_state:
         st.session_state['view'] = 'macro'
     
     # --- ESTADO PERSISTENTE ---
     if 'selected_ids' not in st.session_state: st.session_state['selected_ids'] = set()
-    for key in ['axes_config', 'visibility_map', 'color_map', 'chart_type_map']:
+    for key in ['axes_config', 'visibility_map', 'color_map', 'chart_type_map', 'transform_map']:
         if key not in st.session_state: st.session_state[key] = {}
 
-    logo_b64 = utils.get_base64_image(utils.LOGO_PATH)
+    # --- ESTADO DESDE LA URL ---
+    # Un link compartido (o recargar la página) restaura el gráfico completo en esta misma pasada
+    with perf.span("estado_url"):
+        if share.restore(st.session_state, st.query_params):
+            st.session_state['view'] = 'macro'
 
     # --- CSS GLOBAL ---
     st.markdown(f"""
@@ -145,16 +173,22 @@ def main():
     st.markdown("---") 
 
     # --- CARGA DE DATOS CENTRALIZADA ---
-    # Cargamos los datos una vez aquí y los pasamos a las vistas
-    df_index = utils.load_metadata()
-    if df_index is None: return
-    all_data_sheets = utils.load_all_data()
+    # Índice completo; las hojas de datos se cargan recién cuando una vista las pide.
+    # Un solo catálogo para toda la pasada, aunque en el medio se publique uno nuevo
+    with perf.span("carga"):
+        data_catalog = utils.load_catalog()
+        if data_catalog is None: return
+    # Hits/misses de las hojas en memoria durante el resto de la pasada
+    perf.track(data_catalog.stats)
 
     # --- ENRUTAMIENTO DE VISTAS ---
-    if st.session_state['view'] == 'other':
-        view_heymann.show(all_data_sheets)
-    else:
-        view_macro.show(df_index, all_data_sheets)
+    with perf.span(f"vista_{st.session_state['view']}"):
+        if st.session_state['view'] == 'other':
+            import view_heymann
+            view_heymann.show(data_catalog.series)
+        else:
+            import view_macro
+            view_macro.show(data_catalog)
 
     st.markdown(f"""<div class="footer"><a href="https://github.com/HermesBV" target="_blank">Salieris de Heymann (2025) GitHub/HermesBV</a></div>""", unsafe_allow_html=True)
 
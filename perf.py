@@ -0,0 +1,141 @@
+"""Instrumentación por pasada: tiempos por etapa, contadores de caché y tamaño de payloads.
+
+Cada rerun (o re-ejecución de un fragmento) es una `run`; dentro, `span()` mide
+etapas anidadas, `incr()` suma contadores y `payload()` registra bytes enviados
+al navegador. Al cerrar la pasada se emite una línea JSON en el logger
+"seriesmacro.perf" (con SERIESMACRO_PERF=1) para agregarla entre sesiones.
+Sin dependencia de Streamlit.
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+LOG_ENABLED = os.environ.get("SERIESMACRO_PERF", "").lower() in ("1", "true", "si", "sí")
+HISTORIAL = 20  # Pasadas y descargas que guarda el panel de depuración
+
+logger = logging.getLogger("seriesmacro.perf")
+if LOG_ENABLED and not logger.handlers:
+    # Una línea JSON por pasada, lista para el agregador de logs
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_current = contextvars.ContextVar("seriesmacro_perf_run", default=None)
+
+class Run:
+    """Registro de una pasada del script"""
+
+    def __init__(self, name, detail=False, **attrs):
+        self.name = name
+        self.attrs = attrs
+        # Con detail se calculan también los tamaños que cuestan serializar (JSON de Plotly)
+        self.detail = detail
+        self.spans = []
+        self.counters = {}
+        self.payloads = {}
+        self._stack = []
+        self._stats_fn = None
+        self._stats_base = None
+        self._t0 = time.perf_counter()
+        self.total_ms = None
+
+    def finish(self):
+        if self._stats_fn is not None:
+            try:
+                _add_deltas(self, "", self._stats_base, self._stats_fn())
+            except Exception:
+                logger.exception("No se pudieron leer los contadores de caché")
+        self.total_ms = round((time.perf_counter() - self._t0) * 1000, 2)
+
+    def as_dict(self):
+        return {
+            "evento": "pasada", "pasada": self.name, **self.attrs, "total_ms": self.total_ms,
+            "etapas": {path: ms for path, ms in self.spans},
+            "contadores": self.counters, "payloads": self.payloads,
+        }
+
+@contextmanager
+def run(name, detail=False, **attrs):
+    """Pasada completa. Si ya hay una abierta (fragmento dentro de un rerun) se registra como
+    etapa de esa y entrega None; si no, entrega el Run, que se loguea al cerrar"""
+    if _current.get() is not None:
+        with span(name):
+            yield None
+        return
+    rec = Run(name, detail=detail, **attrs)
+    token = _current.set(rec)
+    try:
+        yield rec
+    finally:
+        _current.reset(token)
+        rec.finish()
+        if LOG_ENABLED:
+            logger.info(json.dumps(rec.as_dict(), ensure_ascii=False, default=str))
+
+@contextmanager
+def span(name):
+    """Etapa medida dentro de la pasada actual (no hace nada fuera de una pasada)"""
+    rec = _current.get()
+    if rec is None:
+        yield
+        return
+    rec._stack.append(name)
+    path = "/".join(rec._stack)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec.spans.append((path, round((time.perf_counter() - t0) * 1000, 2)))
+        rec._stack.pop()
+
+def incr(name, n=1):
+    rec = _current.get()
+    if rec is not None:
+        rec.counters[name] = rec.counters.get(name, 0) + n
+
+def track(stats_fn):
+    """Contadores acumulados (ej. hits/misses de los LRU) cuya diferencia se suma al cerrar la pasada.
+    Con sesiones concurrentes la diferencia incluye lo que hicieron las demás"""
+    rec = _current.get()
+    if rec is None or rec._stats_fn is not None:
+        return
+    rec._stats_fn = stats_fn
+    rec._stats_base = stats_fn()
+
+_NO_CONTADORES = {"version", "loaded", "bytes", "max_bytes"}
+
+def _add_deltas(rec, prefix, before, after):
+    for key, value in after.items():
+        if key in _NO_CONTADORES or key not in before:
+            continue
+        if isinstance(value, dict):
+            _add_deltas(rec, f"{prefix}{key}.", before[key], value)
+        elif isinstance(value, (int, float)) and value != before[key]:
+            rec.counters[f"{prefix}{key}"] = rec.counters.get(f"{prefix}{key}", 0) + value - before[key]
+
+def payload(name, size_fn):
+    """Tamaño (bytes) de lo que se envía al navegador. `size_fn` sólo se evalúa con detail"""
+    rec = _current.get()
+    if rec is not None and rec.detail:
+        rec.payloads[name] = rec.payloads.get(name, 0) + int(size_fn())
+
+def download(name, make_bytes, sink=None, **attrs):
+    """Genera una descarga diferida (corre al hacer clic, fuera de la pasada) y registra su
+    tamaño y duración en el log y, si se pasa, en la lista `sink` (máx. HISTORIAL entradas)"""
+    t0 = time.perf_counter()
+    data = make_bytes()
+    event = {
+        "evento": "descarga", "descarga": name, **attrs, "bytes": len(data) if data is not None else 0,
+        "ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+    if sink is not None:
+        sink.append(event)
+        del sink[:-HISTORIAL]
+    if LOG_ENABLED:
+        logger.info(json.dumps(event, ensure_ascii=False, default=str))
+    return data
@@ -0,0 +1,91 @@
+"""Índice invertido para el Buscador General (sin acentos, por prefijo, con ranking difuso)."""
+import bisect
+import difflib
+import re
+import unicodedata
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def fold(text):
+    """Minúsculas y sin acentos: 'Inflación' -> 'inflacion'"""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+class SearchIndex:
+    """Tokens de 'Variable' y 'Pestaña' -> filas, más máscaras por 'Tema' y 'Frecuencia'.
+
+    Una consulta es la intersección de las filas de cada término; un término
+    matchea todos los tokens que empiezan con él (búsqueda binaria sobre el
+    vocabulario ordenado). Si un término no aparece, se usan los tokens más
+    parecidos (difflib) y el resultado se ordena por similitud.
+    """
+
+    def __init__(self, df, text_columns=('Variable', 'Pestaña'), facet_columns=('Tema', 'Frecuencia')):
+        self.n_rows = len(df)
+        postings = {}
+        for col in text_columns:
+            for pos, value in enumerate(df[col].astype(str)):
+                for token in tokenize(value):
+                    postings.setdefault(token, set()).add(pos)
+        self.vocabulary = sorted(postings)
+        self._postings = {t: np.fromiter(sorted(p), dtype=np.int64) for t, p in postings.items()}
+        # Texto completo plegado, para frases que cruzan tokens (ej. "p.b.i")
+        self._folded = [" ".join(fold(v) for v in row) for row in df[list(text_columns)].astype(str).itertuples(index=False)]
+        self._facets = {
+            col: {value: (df[col] == value).to_numpy() for value in df[col].dropna().unique()}
+            for col in facet_columns
+        }
+
+    def _prefix_rows(self, term):
+        """Máscara de filas con algún token que empieza con `term`"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        i = bisect.bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            mask[self._postings[self.vocabulary[i]]] = True
+            i += 1
+        return mask
+
+    def _fuzzy_rows(self, term, cutoff=0.75):
+        """Máscara y puntaje (similitud) por fila para un término sin coincidencias exactas"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        score = np.zeros(self.n_rows)
+        for token in difflib.get_close_matches(term, self.vocabulary, n=10, cutoff=cutoff):
+            rows = self._postings[token]
+            mask[rows] = True
+            score[rows] = np.maximum(score[rows], difflib.SequenceMatcher(None, term, token).ratio())
+        return mask, score
+
+    def facet_mask(self, column, value):
+        return self._facets[column].get(value, np.zeros(self.n_rows, dtype=bool))
+
+    def search(self, text, facets=None):
+        """Posiciones de las filas que cumplen la consulta y los filtros, de mejor a peor"""
+        mask = np.ones(self.n_rows, dtype=bool)
+        for column, value in (facets or {}).items():
+            mask &= self.facet_mask(column, value)
+
+        score = np.zeros(self.n_rows)
+        folded_text = fold(text).strip()
+        terms = tokenize(text)
+        if folded_text and not terms:
+            # Sin tokens alfanuméricos: subcadena literal, como el buscador original
+            mask &= np.array([folded_text in row for row in self._folded], dtype=bool)
+        for term in terms:
+            term_mask = self._prefix_rows(term)
+            if term_mask.any():
+                score += term_mask
+            else:
+                term_mask, term_score = self._fuzzy_rows(term)
+                score += term_score
+            mask &= term_mask
+
+        rows = np.flatnonzero(mask)
+        if terms:
+            # Orden estable: primero coincidencias exactas/prefijo, luego las difusas
+            rows = rows[np.argsort(-score[rows], kind="stable")]
+        return rows
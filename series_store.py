@@ -0,0 +1,145 @@
+"""Series normalizadas: índice de fechas ordenado y valores float64, una vez por proceso.
+
+Cada hoja normalizada se guarda compacta (CompactSheet): un calendario int64
+compartido por todas las hojas que tienen las mismas fechas y, por serie, un
+array contiguo de valores recortado a su primer y último dato. Las series se
+entregan como vistas pandas de esos arrays, sin copiarlos.
+"""
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import align
+from sheet_store import DEFAULT_MAX_BYTES, SheetStore
+
+def normalize_sheet(df):
+    """Hoja cruda -> DataFrame indexado por 'Fecha' (ordenado, sin NaT ni duplicados), columnas float64"""
+    if df.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Fecha'))
+    date_col = 'Fecha' if 'Fecha' in df.columns else df.columns[0]
+    fechas = pd.to_datetime(df[date_col], errors='coerce')
+    values = {
+        col: pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        for col in df.columns if col != date_col
+    }
+    out = pd.DataFrame(values, index=pd.DatetimeIndex(fechas, name='Fecha'))
+    out = out[out.index.notna()]
+    if out.index.has_duplicates:
+        # Fechas repetidas (filas de relleno en muchas hojas): último valor no nulo por columna
+        return out.groupby(level=0, sort=True).last()
+    return out.sort_index(kind='mergesort')
+
+# --- CALENDARIOS COMPARTIDOS ---
+_calendars = weakref.WeakValueDictionary()
+_calendars_lock = threading.Lock()
+
+def shared_calendar(index):
+    """Fechas como int64 de solo lectura; hojas con el mismo calendario comparten el array"""
+    unit = np.datetime_data(index.dtype)[0]
+    fechas = np.array(index.asi8, dtype='int64')
+    key = (unit, len(fechas), hashlib.blake2b(fechas.tobytes(), digest_size=16).digest())
+    with _calendars_lock:
+        found = _calendars.get(key)
+        if found is not None:
+            return found, unit
+        fechas.setflags(write=False)
+        _calendars[key] = fechas
+    return fechas, unit
+
+# --- HOJA COMPACTA ---
+class CompactSheet:
+    """Hoja normalizada en arrays: calendario int64 compartido + valores contiguos por serie"""
+
+    def __init__(self, frame, dtype='float64'):
+        self.calendar, self.unit = shared_calendar(frame.index)
+        self.columns = list(frame.columns)
+        # columna -> (inicio, fin, valores): la serie ocupa calendar[inicio:fin]
+        self._series = {}
+        for col in self.columns:
+            raw = frame[col].to_numpy(dtype='float64')
+            valid = np.flatnonzero(~np.isnan(raw))
+            start, stop = (int(valid[0]), int(valid[-1]) + 1) if len(valid) else (0, 0)
+            values = np.array(raw[start:stop], dtype=dtype)
+            values.setflags(write=False)
+            self._series[col] = (start, stop, values)
+
+    @property
+    def nbytes(self):
+        # El calendario se cuenta en cada hoja aunque esté compartido (cota superior para el LRU)
+        return self.calendar.nbytes + sum(v.nbytes for _, _, v in self._series.values())
+
+    def __contains__(self, col):
+        return col in self._series
+
+    def _dates(self, start, stop):
+        return pd.DatetimeIndex(self.calendar[start:stop].view(f'datetime64[{self.unit}]'), name='Fecha', copy=False)
+
+    def series(self, col, name=None):
+        """Serie de la columna como vista (sin copiar fechas ni valores float64)"""
+        start, stop, values = self._series[col]
+        return pd.Series(values, index=self._dates(start, stop), name=col if name is None else name, copy=False)
+
+    def to_frame(self, columns=None, window=None):
+        """Hoja (o sus `columns`) sobre el calendario original, opcionalmente sólo las fechas
+        de `window` (desde, hasta). Arma una copia: es para descargas"""
+        first, last = 0, len(self.calendar)
+        if window is not None:
+            first, last = align.window_positions(self._dates(0, last), window)
+        columns = self.columns if columns is None else [c for c in columns if c in self._series]
+        data = {}
+        for col in columns:
+            start, stop, values = self._series[col]
+            full = np.full(last - first, np.nan)
+            lo, hi = max(start, first), min(stop, last)
+            if hi > lo:
+                full[lo - first:hi - first] = values[lo - start:hi - start]
+            data[col] = full
+        return pd.DataFrame(data, index=self._dates(first, last), columns=columns)
+
+class SeriesStore:
+    """Series por ID del índice, normalizadas al primer uso y compartidas entre reruns.
+
+    `sheets` es el SheetStore crudo (para descargas textuales); las hojas
+    normalizadas (CompactSheet) viven en un LRU propio acotado por `max_bytes`.
+    Con dtype='float32' los valores ocupan la mitad (y `get` devuelve float32).
+    """
+
+    def __init__(self, df_index, sheets, max_bytes=DEFAULT_MAX_BYTES, dtype='float64'):
+        self.sheets = sheets
+        self.dtype = dtype
+        self._meta = df_index.drop_duplicates('ID').set_index('ID')
+        self._frames = SheetStore(
+            list(sheets), lambda tab: CompactSheet(normalize_sheet(sheets[tab]), dtype), max_bytes=max_bytes
+        )
+
+    def stats(self):
+        return self._frames.stats()
+
+    def adopt(self, other, tabs):
+        """Reutiliza las hojas normalizadas de otra versión para las pestañas que no cambiaron"""
+        return self._frames.adopt(other._frames, tabs)
+
+    def compact(self, tab_name):
+        """Hoja normalizada compacta (None si la pestaña no existe)"""
+        if tab_name not in self._frames:
+            return None
+        return self._frames[tab_name]
+
+    def frame(self, tab_name):
+        """Hoja normalizada completa como DataFrame (None si la pestaña no existe)"""
+        sheet = self.compact(tab_name)
+        return sheet.to_frame() if sheet is not None else None
+
+    def get(self, var_id):
+        """Serie indexada por fecha (del primer al último dato) para un ID del índice, o None.
+        Es una vista de solo lectura de los arrays compartidos"""
+        if var_id not in self._meta.index:
+            return None
+        row = self._meta.loc[var_id]
+        sheet = self.compact(row['Pestaña'])
+        if sheet is None or row['Variable'] not in sheet:
+            return None
+        return sheet.series(row['Variable'], name=var_id)
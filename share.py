@@ -0,0 +1,223 @@
+"""Estado del gráfico en la URL: serialización compacta y restauración en una sola pasada.
+
+El estado (selección, ejes, visibilidad, colores, tipos, transformaciones y
+controles del gráfico) se guarda como JSON comprimido en `?s=`. Si no entra en
+una URL razonable se guarda en un almacén local y la URL lleva sólo su hash
+(`?g=`); el almacén guarda a lo sumo MAX_GUARDADOS estados y descarta los que
+llevan MAX_DIAS sin usarse. Un enlace editado a mano, truncado o viejo se
+restaura sólo en lo que sea válido. Sin dependencia de Streamlit: trabaja sobre
+mappings (session_state, query_params).
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+import zlib
+
+import pandas as pd
+
+import align
+import transforms
+
+STORE_DIR = 'bds/.compartidos'
+MAX_URL_CHARS = 1500  # Por encima, el estado va al almacén local
+MAX_GUARDADOS = 500  # sync guarda cada variante del gráfico: el almacén se poda al escribir
+MAX_DIAS = 30  # Estados sin abrir ni guardar en este plazo se borran
+FORMATO = 1
+
+PARAM_ESTADO = "s"
+PARAM_HASH = "g"
+FLAG_RESTAURADO = "_estado_url_restaurado"
+
+# Controles del gráfico (claves de widgets) que forman parte del estado
+CONTROLES = {"align_freq": "Original", "align_how": "Último", "full_resolution": False, "render_mode": "Auto", "date_window": "Todo"}
+# Opciones de cada control y tipos de trazo (las mismas que ofrecen los widgets)
+OPCIONES_CONTROLES = {
+    "align_freq": ["Original"] + align.FRECUENCIAS[1:],
+    "align_how": list(align.MODOS_AGREGACION),
+    "full_resolution": [False, True],
+    "render_mode": ["Auto", "SVG", "WebGL"],
+    "date_window": list(align.VENTANAS),
+}
+TIPOS_GRAFICO = ["Línea", "Barras", "Área", "Puntos"]
+_RE_HASH = re.compile(r"^[0-9a-f]{12}$")
+_RE_COLOR = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+# --- SERIALIZACIÓN ---
+def snapshot(state):
+    """Estado del gráfico en forma compacta (sólo lo que difiere de los defaults)"""
+    ids = sorted(state.get('selected_ids', ()))
+    selected = set(ids)
+    snap = {"v": FORMATO, "ids": ids}
+    derecho = sorted(i for i, eje in state.get('axes_config', {}).items() if i in selected and eje == "Derecho")
+    ocultas = sorted(i for i, vis in state.get('visibility_map', {}).items() if i in selected and not vis)
+    colores = {i: c for i, c in state.get('color_map', {}).items() if i in selected}
+    tipos = {i: t for i, t in state.get('chart_type_map', {}).items() if i in selected and t != "Línea"}
+    transf = {
+        i: [t['nombre'], t['params']] for i, t in state.get('transform_map', {}).items()
+        if i in selected and t['nombre'] != "Original"
+    }
+    controles = {k: state[k] for k, default in CONTROLES.items() if k in state and state[k] != default}
+    for key, value in (("der", derecho), ("ocu", ocultas), ("col", colores), ("tipo", tipos), ("tr", transf), ("ctl", controles)):
+        if value:
+            snap[key] = value
+    return snap
+
+def encode(snap):
+    raw = json.dumps(snap, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(zlib.compress(raw, 9)).rstrip(b"=").decode("ascii")
+
+def decode(token):
+    """Snapshot desde el token de la URL (None si está dañado o es de otro formato)"""
+    try:
+        raw = zlib.decompress(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        snap = json.loads(raw)
+    except (ValueError, zlib.error):
+        return None
+    if not isinstance(snap, dict) or snap.get("v") != FORMATO:
+        return None
+    return snap
+
+# --- ALMACÉN LOCAL ---
+def save(token, store_dir=STORE_DIR):
+    """Guarda el token y devuelve su hash corto (idempotente)"""
+    key = hashlib.sha256(token.encode("ascii")).hexdigest()[:12]
+    path = os.path.join(store_dir, f"{key}.txt")
+    if not os.path.exists(path):
+        os.makedirs(store_dir, exist_ok=True)
+        tmp = os.path.join(store_dir, f".{key}.{uuid.uuid4().hex}")
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(token)
+        os.replace(tmp, path)
+        prune(store_dir, keep=key)
+    return key
+
+def prune(store_dir=STORE_DIR, max_files=MAX_GUARDADOS, max_age_days=MAX_DIAS, keep=None):
+    """Borra los estados más viejos (por último uso) hasta dejar `max_files` y ninguno
+    con más de `max_age_days` días. Devuelve cuántos borró"""
+    try:
+        entries = [e for e in os.scandir(store_dir) if e.name.endswith(".txt") and e.name != f"{keep}.txt"]
+    except OSError:
+        return 0
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    limit = time.time() - max_age_days * 86400
+    # `keep` (el recién guardado) ocupa uno de los lugares
+    cut = max(max_files - (keep is not None), 0)
+    stale = entries[cut:] + [e for e in entries[:cut] if e.stat().st_mtime < limit]
+    removed = 0
+    for entry in stale:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            # Otra sesión ya lo borró
+            pass
+    return removed
+
+def load(key, store_dir=STORE_DIR):
+    if not _RE_HASH.match(key or ""):
+        return None
+    path = os.path.join(store_dir, f"{key}.txt")
+    try:
+        with open(path, encoding="ascii") as f:
+            token = f.read()
+    except OSError:
+        return None
+    try:
+        # Abrir un enlace cuenta como uso: no se poda mientras se siga compartiendo
+        os.utime(path)
+    except OSError:
+        pass
+    return token
+
+# --- URL ---
+def to_query(state, store_dir=STORE_DIR):
+    """Query params que representan el estado ({} si no hay nada seleccionado)"""
+    snap = snapshot(state)
+    if not snap["ids"]:
+        return {}
+    token = encode(snap)
+    if len(token) <= MAX_URL_CHARS:
+        return {PARAM_ESTADO: token}
+    return {PARAM_HASH: save(token, store_dir)}
+
+def from_query(query, store_dir=STORE_DIR):
+    token = query.get(PARAM_ESTADO)
+    if token is None and query.get(PARAM_HASH):
+        token = load(query.get(PARAM_HASH), store_dir)
+    return decode(token) if token else None
+
+def _field(snap, key, kind):
+    value = snap.get(key)
+    return value if isinstance(value, kind) else kind()
+
+def _transform(entry):
+    """{'nombre', 'params'} de una entrada `tr` del snapshot, o None si no es válida"""
+    if not isinstance(entry, list) or len(entry) != 2 or not isinstance(entry[1], dict):
+        return None
+    nombre, params = entry
+    if nombre not in transforms.TRANSFORMACIONES or nombre == transforms.ORIGINAL:
+        return None
+    if nombre == "Promedio móvil":
+        try:
+            ventana = int(params.get("ventana"))
+        except (TypeError, ValueError, OverflowError):
+            return None
+        params = {"ventana": min(max(ventana, transforms.VENTANA_MIN), transforms.VENTANA_MAX)}
+    elif nombre == "Base 100":
+        # El rango de la serie se conoce recién al dibujar: ahí se acota la fecha
+        try:
+            base = pd.Timestamp(params.get("base"))
+        except (TypeError, ValueError):
+            return None
+        if pd.isna(base):
+            return None
+        params = {"base": base.strftime('%Y-%m-%d')}
+    elif nombre == "Deflactada":
+        deflactor = params.get("deflactor")
+        params = {"deflactor": deflactor if isinstance(deflactor, str) else None}
+    else:
+        params = {}
+    return {"nombre": nombre, "params": params}
+
+def apply(snap, state):
+    """Carga el snapshot en session_state de una vez (antes de dibujar los widgets).
+    Las entradas inválidas se descartan y quedan los defaults"""
+    ids = [i for i in _field(snap, "ids", list) if isinstance(i, str)]
+    state['selected_ids'] = set(ids)
+    der, ocu = _field(snap, "der", list), _field(snap, "ocu", list)
+    colores, tipos = _field(snap, "col", dict), _field(snap, "tipo", dict)
+    state['axes_config'] = {i: "Derecho" if i in der else "Izquierdo" for i in ids}
+    state['visibility_map'] = {i: i not in ocu for i in ids}
+    state['color_map'] = {i: c for i, c in colores.items() if i in state['selected_ids'] and isinstance(c, str) and _RE_COLOR.match(c)}
+    state['chart_type_map'] = {i: tipos[i] if tipos.get(i) in TIPOS_GRAFICO else "Línea" for i in ids}
+    state['transform_map'] = {}
+    for i, entry in _field(snap, "tr", dict).items():
+        transform = _transform(entry) if i in state['selected_ids'] else None
+        if transform is not None:
+            state['transform_map'][i] = transform
+    for key, value in _field(snap, "ctl", dict).items():
+        # Mismo tipo que el default: 0/1 no pasan por False/True
+        if key in OPCIONES_CONTROLES and type(value) is type(CONTROLES[key]) and value in OPCIONES_CONTROLES[key]:
+            state[key] = value
+
+def restore(state, query, store_dir=STORE_DIR):
+    """Restaura el estado de la URL una sola vez por sesión. True si había algo que restaurar"""
+    if state.get(FLAG_RESTAURADO):
+        return False
+    state[FLAG_RESTAURADO] = True
+    snap = from_query(query, store_dir)
+    if snap is None:
+        return False
+    apply(snap, state)
+    return True
+
+def sync(state, query, store_dir=STORE_DIR):
+    """Actualiza los query params si el estado cambió (no provoca un rerun)"""
+    wanted = to_query(state, store_dir)
+    current = {k: query.get(k) for k in (PARAM_ESTADO, PARAM_HASH) if query.get(k)}
+    if current != wanted:
+        query.from_dict(wanted)
@@ -0,0 +1,100 @@
+"""Acceso perezoso, hoja por hoja, al libro de datos."""
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import pandas as pd
+
+import data_cache
+
+DEFAULT_MAX_BYTES = 256 << 20
+
+def frame_nbytes(df):
+    if not isinstance(df, pd.DataFrame):
+        # Objetos que ya conocen su tamaño (hojas compactas de SeriesStore)
+        return int(df.nbytes)
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class SheetStore(Mapping):
+    """Dict de solo lectura {pestaña: DataFrame} que carga cada hoja recién al pedirla.
+
+    Las hojas cargadas se guardan en un LRU acotado por `max_bytes` (la hoja
+    más reciente se conserva aunque sola supere el presupuesto). Los DataFrames
+    devueltos se comparten entre sesiones: no modificarlos.
+    """
+
+    def __init__(self, names, loader, max_bytes=DEFAULT_MAX_BYTES):
+        self._names = list(names)
+        self._name_set = set(self._names)
+        self._loader = loader
+        self._max_bytes = max_bytes
+        self._sheets = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = 0
+
+    @classmethod
+    def from_cache(cls, manifest, cache_dir=data_cache.CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, mmap=False):
+        return cls(
+            data_cache.sheet_names(manifest),
+            lambda name: data_cache.read_sheet(manifest, name, cache_dir, mmap=mmap),
+            max_bytes=max_bytes,
+        )
+
+    @classmethod
+    def from_excel(cls, path=data_cache.XLSX_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        with pd.ExcelFile(path) as xls:
+            names = xls.sheet_names
+        engine = data_cache.excel_engine()
+        return cls(names, lambda name: pd.read_excel(path, sheet_name=name, engine=engine), max_bytes=max_bytes)
+
+    def __getitem__(self, name):
+        if name not in self._name_set:
+            raise KeyError(name)
+        with self._lock:
+            if name in self._sheets:
+                self._hits += 1
+                self._sheets.move_to_end(name)
+                return self._sheets[name]
+            self._misses += 1
+        df = self._loader(name)
+        size = frame_nbytes(df)
+        with self._lock:
+            self._sheets[name] = df
+            self._sizes[name] = size
+            self._sheets.move_to_end(name)
+            while len(self._sheets) > 1 and sum(self._sizes.values()) > self._max_bytes:
+                evicted, _ = self._sheets.popitem(last=False)
+                del self._sizes[evicted]
+                self._evictions += 1
+        return df
+
+    def adopt(self, other, names):
+        """Copia desde otro store las hojas ya cargadas de `names` (sin volver a leerlas)"""
+        with other._lock:
+            carried = [(n, other._sheets[n], other._sizes[n]) for n in other._sheets if n in names and n in self._name_set]
+        with self._lock:
+            for name, df, size in carried:
+                self._sheets[name] = df
+                self._sizes[name] = size
+            while len(self._sheets) > 1 and sum(self._sizes.values()) > self._max_bytes:
+                del self._sizes[self._sheets.popitem(last=False)[0]]
+        return len(carried)
+
+    def __contains__(self, name):
+        # Sin cargar la hoja (Mapping.__contains__ llamaría a __getitem__)
+        return name in self._name_set
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def stats(self):
+        """Contadores de uso del LRU"""
+        with self._lock:
+            return {
+                "hits": self._hits, "misses": self._misses, "evictions": self._evictions,
+                "loaded": len(self._sheets), "bytes": sum(self._sizes.values()), "max_bytes": self._max_bytes,
+            }
@@ -0,0 +1,56 @@
+"""Resumen por serie (rango de fechas, observaciones, último valor, extremos y sparkline).
+
+Se calcula una vez por hoja al armar la caché (data_cache.build_cache) y viaja en
+el manifiesto junto a los archivos de la hoja: las hojas sin cambios reutilizan
+su resumen y el buscador lo muestra sin cargar ninguna serie. Sin dependencia
+de Streamlit.
+"""
+import math
+
+import pandas as pd
+
+import downsample
+from series_store import normalize_sheet
+
+PUNTOS_SPARKLINE = 40
+COLUMNAS = ["Desde", "Hasta", "Obs.", "Último", "Mín.", "Máx.", "Tendencia"]
+
+def _number(value):
+    # JSON no admite NaN/inf
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def series_summary(serie, points=PUNTOS_SPARKLINE):
+    """Resumen de una serie normalizada (None si no tiene datos)"""
+    valid = serie.dropna()
+    if valid.empty:
+        return None
+    values = valid.to_numpy(dtype='float64')
+    spark = downsample.downsample(valid, points, method="lttb")
+    return {
+        "desde": valid.index[0].strftime('%Y-%m-%d'), "hasta": valid.index[-1].strftime('%Y-%m-%d'),
+        "n": int(len(values)), "ultimo": _number(values[-1]),
+        "min": _number(values.min()), "max": _number(values.max()),
+        "spark": [_number(v) for v in spark.to_numpy(dtype='float64')],
+    }
+
+def sheet_summary(df):
+    """{variable: resumen} de una hoja cruda, tal como se guarda en el manifiesto"""
+    frame = normalize_sheet(df)
+    return {str(col): series_summary(frame[col]) for col in frame.columns}
+
+def summary_table(df_index, summaries):
+    """Tabla por ID (columnas COLUMNAS) a partir de {pestaña: {variable: resumen}}"""
+    rows = {}
+    for var_id, tab, variable in zip(df_index['ID'], df_index['Pestaña'], df_index['Variable']):
+        found = summaries.get(tab, {}).get(str(variable))
+        if found is not None:
+            rows[var_id] = (found["desde"], found["hasta"], found["n"], found["ultimo"], found["min"], found["max"], found["spark"])
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=COLUMNAS)
+    table["Desde"] = pd.to_datetime(table["Desde"])
+    table["Hasta"] = pd.to_datetime(table["Hasta"])
+    table["Obs."] = table["Obs."].astype('Int64')
+    for col in ("Último", "Mín.", "Máx."):
+        table[col] = table[col].astype('float64')
+    table.index.name = 'ID'
+    return table
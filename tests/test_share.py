@@ -0,0 +1,77 @@
+"""Restauración del estado desde enlaces editados a mano, truncados o viejos."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import share  # noqa: E402
+
+def restored(**snap):
+    state = {}
+    share.apply({"v": share.FORMATO, **snap}, state)
+    return state
+
+def test_ids_deben_ser_lista_de_str():
+    assert restored(ids="A")['selected_ids'] == set()
+    assert restored(ids=["A", 3, None, ["B"]])['selected_ids'] == {"A"}
+
+def test_tipo_desconocido_vuelve_a_linea():
+    state = restored(ids=["A", "B"], tipo={"A": "Torta", "B": "Barras"})
+    assert state['chart_type_map'] == {"A": "Línea", "B": "Barras"}
+
+def test_color_invalido_se_descarta():
+    state = restored(ids=["A", "B", "C"], col={"A": "red", "B": "#00ff00", "C": 5, "Z": "#FFFFFF"})
+    assert state['color_map'] == {"B": "#00ff00"}
+
+def test_transformacion_desconocida_se_descarta():
+    state = restored(ids=["A", "B"], tr={"A": ["Logaritmo", {}], "B": "Base 100"})
+    assert state['transform_map'] == {}
+
+@pytest.mark.parametrize("ventana, esperado", [("abc", None), (None, None), (5000, 520), (0, 2), ("12", 12), (7.9, 7)])
+def test_ventana_entera_y_acotada(ventana, esperado):
+    tr = restored(ids=["A"], tr={"A": ["Promedio móvil", {"ventana": ventana}]})['transform_map']
+    if esperado is None:
+        assert tr == {}
+    else:
+        assert tr["A"]["params"] == {"ventana": esperado}
+
+def test_base_se_normaliza_o_se_descarta():
+    state = restored(ids=["A", "B"], tr={"A": ["Base 100", {"base": "1800-01-01T00:00"}], "B": ["Base 100", {"base": "ayer"}]})
+    assert state['transform_map'] == {"A": {"nombre": "Base 100", "params": {"base": "1800-01-01"}}}
+
+def test_deflactor_no_str_queda_sin_elegir():
+    state = restored(ids=["A"], tr={"A": ["Deflactada", {"deflactor": ["B"]}]})
+    assert state['transform_map']["A"]["params"] == {"deflactor": None}
+
+def test_controles_fuera_de_opciones_se_ignoran():
+    state = restored(ids=["A"], ctl={"render_mode": "Canvas", "date_window": "1 año", "full_resolution": 1, "otro": "x"})
+    assert "render_mode" not in state and "full_resolution" not in state and "otro" not in state
+    assert state["date_window"] == "1 año"
+
+def test_enlace_truncado_no_restaura_nada():
+    token = share.encode({"v": share.FORMATO, "ids": ["A"]})
+    state = {}
+    assert not share.restore(state, {share.PARAM_ESTADO: token[:-5]})
+    assert "selected_ids" not in state
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(ROOT, "bds", "BD.xlsx")), reason="Sin bds/BD.xlsx")
+def test_enlace_invalido_no_rompe_la_pagina(monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    import utils
+
+    monkeypatch.chdir(ROOT)
+    ids = list(utils.load_catalog().index['ID'][:4])
+    snap = {
+        "v": share.FORMATO, "ids": ids, "col": {ids[0]: "red"}, "tipo": {ids[1]: "Torta"},
+        "tr": {ids[0]: ["Logaritmo", {}], ids[1]: ["Promedio móvil", {"ventana": 5000}],
+               ids[2]: ["Base 100", {"base": "1800-01-01"}], ids[3]: ["Deflactada", {"deflactor": "NO_EXISTE"}]},
+        "ctl": {"date_window": "abc"},
+    }
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=120)
+    at.query_params[share.PARAM_ESTADO] = share.encode(snap)
+    at.run()
+    assert not at.exception
+    assert at.session_state['selected_ids'] == set(ids)
+    assert len(at.get('plotly_chart')) == 1
@@ -0,0 +1,124 @@
+"""Series derivadas: variaciones, promedio móvil, cambio de base y deflactado.
+
+Funciones vectorizadas sobre las series normalizadas (índice de fechas ordenado,
+float64), sin dependencia de Streamlit. La frecuencia es la columna 'Frecuencia'
+del índice: la variación interanual compara contra 12 períodos en series
+mensuales, 4 en trimestrales, etc.
+"""
+import numpy as np
+import pandas as pd
+
+ORIGINAL = "Original"
+TRANSFORMACIONES = [
+    ORIGINAL, "Var. % i.a.", "Var. % período anterior", "Promedio móvil", "Base 100", "Deflactada",
+]
+# Sufijo que se agrega al nombre de la serie en el gráfico
+SUFIJOS = {
+    "Var. % i.a.": "var. % i.a.",
+    "Var. % período anterior": "var. %",
+    "Promedio móvil": "prom. móvil",
+    "Base 100": "base 100",
+    "Deflactada": "real",
+}
+
+# Frecuencia -> (período de pandas, rezago interanual, rezago del período anterior)
+PERIODOS = {
+    "Anual": ("Y", 1, 1),
+    "Semestral": ("Q", 4, 2),
+    "Trimestral": ("Q", 4, 1),
+    "Mensual": ("M", 12, 1),
+}
+# Ventana por defecto del promedio móvil (observaciones)
+VENTANA_DEFAULT = {"Anual": 3, "Semestral": 2, "Trimestral": 4, "Mensual": 12, "Diaria": 30}
+VENTANA_MIN, VENTANA_MAX = 2, 520  # Límites del control de la ventana
+TOLERANCIA_DIARIA = pd.Timedelta(days=7)  # Hueco máximo para encontrar el dato de hace un año
+
+def infer_frequency(serie):
+    """Frecuencia aproximada según la separación mediana entre fechas"""
+    fechas = serie.dropna().index
+    if len(fechas) < 2:
+        return "Mensual"
+    dias = np.median(np.diff(fechas.to_numpy()).astype('timedelta64[D]').astype(float))
+    for limite, freq in ((7, "Diaria"), (45, "Mensual"), (120, "Trimestral"), (250, "Semestral")):
+        if dias <= limite:
+            return freq
+    return "Anual"
+
+def _frequency(serie, frecuencia):
+    return frecuencia if frecuencia in PERIODOS or frecuencia == "Diaria" else infer_frequency(serie)
+
+def _lagged(serie, frecuencia, anual):
+    """Valor de la misma serie un año (o un período) antes, alineado a cada fecha"""
+    if frecuencia == "Diaria":
+        valid = serie.dropna()
+        if anual:
+            prev = valid.reindex(valid.index - pd.DateOffset(years=1), method='ffill', tolerance=TOLERANCIA_DIARIA)
+            prev.index = valid.index
+        else:
+            prev = valid.shift(1)
+        return prev.reindex(serie.index).to_numpy()
+    code, lag_anual, lag_periodo = PERIODOS[frecuencia]
+    periodos = serie.index.to_period(code)
+    valores = pd.Series(serie.to_numpy(), index=periodos)
+    if periodos.has_duplicates:
+        valores = valores[~periodos.duplicated(keep='last')]
+    return valores.reindex(periodos - (lag_anual if anual else lag_periodo)).to_numpy()
+
+def pct_change(serie, frecuencia, anual=True):
+    """Variación porcentual interanual o contra el período anterior"""
+    prev = _lagged(serie, _frequency(serie, frecuencia), anual)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = (serie.to_numpy() / prev - 1.0) * 100.0
+    out[~np.isfinite(out)] = np.nan
+    return pd.Series(out, index=serie.index, name=serie.name)
+
+def rolling_mean(serie, window):
+    """Promedio móvil de `window` observaciones no nulas"""
+    valid = serie.dropna()
+    return valid.rolling(int(window), min_periods=int(window)).mean().reindex(serie.index)
+
+def rebase(serie, base_date):
+    """Índice con base 100 en el último dato disponible a `base_date`"""
+    valid = serie.dropna()
+    base = valid.asof(pd.Timestamp(base_date)) if len(valid) and base_date else np.nan
+    if pd.isna(base) or base == 0:
+        return pd.Series(np.nan, index=serie.index, name=serie.name)
+    return serie * (100.0 / base)
+
+def deflate(serie, deflator):
+    """Serie a precios del último dato del deflactor (nominal / índice de precios)"""
+    precios = deflator.dropna()
+    if precios.empty:
+        return pd.Series(np.nan, index=serie.index, name=serie.name)
+    # El índice de precios vigente en cada fecha de la serie nominal
+    alineado = precios.reindex(serie.index, method='ffill').to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = serie.to_numpy() / alineado * precios.iloc[-1]
+    return pd.Series(out, index=serie.index, name=serie.name)
+
+def default_params(transform, serie, frecuencia):
+    """Parámetros iniciales de una transformación para una serie"""
+    if transform == "Promedio móvil":
+        return {"ventana": VENTANA_DEFAULT[_frequency(serie, frecuencia)]}
+    if transform == "Base 100":
+        valid = serie.dropna()
+        return {"base": valid.index[0].strftime('%Y-%m-%d') if len(valid) else None}
+    if transform == "Deflactada":
+        return {"deflactor": None}
+    return {}
+
+def apply(serie, transform, frecuencia=None, deflator=None, **params):
+    """Serie derivada. `deflator` es la serie de precios ya cargada (sólo para 'Deflactada')"""
+    if transform == ORIGINAL:
+        return serie
+    if transform == "Var. % i.a.":
+        return pct_change(serie, frecuencia, anual=True)
+    if transform == "Var. % período anterior":
+        return pct_change(serie, frecuencia, anual=False)
+    if transform == "Promedio móvil":
+        return rolling_mean(serie, params["ventana"])
+    if transform == "Base 100":
+        return rebase(serie, params["base"])
+    if transform == "Deflactada":
+        return deflate(serie, deflator)
+    raise ValueError(f"Transformación desconocida: {transform}")
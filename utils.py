@@ -3,9 +3,22 @@ import pandas as pd
 import os
 import base64
 import io
+from contextlib import contextmanager
+import align
+import catalog
+import downsample
+import export
+import perf
+import transforms
 
 # --- CONFIGURACIÓN DE RUTAS Y CONSTANTES ---
 FILE_PATH = 'bds/BD.xlsx'
+CACHE_DIR = 'bds/.cache'
+MEMORY_BUDGET = catalog.memory_budget_from_env()  # Bytes para hojas en memoria (SERIESMACRO_MEMORIA_MB)
+USE_MMAP = os.environ.get("SERIESMACRO_MMAP", "1") != "0"  # Hojas Arrow mapeadas y compartidas entre procesos
+VALUES_DTYPE = os.environ.get("SERIESMACRO_VALORES", "float64")  # float32: mitad de memoria por serie (~7 dígitos)
+UMBRAL_PUNTOS_WEBGL = int(os.environ.get("SERIESMACRO_UMBRAL_WEBGL", 10000))  # Puntos totales a partir de los cuales se usa Scattergl
+DEBUG = os.environ.get("SERIESMACRO_DEBUG", "") == "1"  # Panel de rendimiento para todas las sesiones (si no, ?debug=1)
 LOGO_PATH = 'estetica/logo-iiep-macro.png'
 ID_HEYMANN = "ITCRB_USA_M"
 SHEET_HEYMANN = "ITCRB M"
@@ -33,25 +46,65 @@ def get_base64_image(image_path):
             return base64.b64encode(img_file.read()).decode()
     return ""
 
-@st.cache_data
-def load_metadata():
+@st.cache_resource(show_spinner=False)
+def get_logo_assets():
+    """(ícono de página, logo en base64): se calculan una vez por proceso, no en cada rerun"""
+    page_icon = None
+    if os.path.exists(LOGO_PATH):
+        try:
+            from PIL import Image
+            img = Image.open(LOGO_PATH).convert("RGBA")
+            background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+            page_icon = Image.alpha_composite(background, img)
+        except:
+            pass
+    return page_icon, get_base64_image(LOGO_PATH)
+
+@st.cache_resource(show_spinner=False)
+def _catalog_holder():
+    perf.incr("catalogo.miss")
+    holder = catalog.CatalogHolder(FILE_PATH, CACHE_DIR, max_bytes=MEMORY_BUDGET, mmap=USE_MMAP, dtype=VALUES_DTYPE)
+    # Un BD.xlsx nuevo se procesa en segundo plano y reemplaza al anterior sin reiniciar
+    holder.watch()
+    return holder
+
+def load_catalog():
+    """Única instancia de datos por proceso, compartida (sin copias) por todas las sesiones.
+    Se pide una sola vez por pasada (rerun o fragmento) y se pasa hacia abajo: el recambio en
+    segundo plano puede ocurrir en cualquier momento y no debe mezclar índice, búsqueda y series
+    de dos versiones distintas"""
     if not os.path.exists(FILE_PATH):
         st.error(f"No se encontró el archivo en {FILE_PATH}.")
         return None
-    df = pd.read_excel(FILE_PATH, sheet_name=0)
-    df['ID'] = df['ID'].astype(str)
-    return df
+    return _catalog_holder().get()
 
-@st.cache_data
-def load_all_data():
-    return pd.read_excel(FILE_PATH, sheet_name=None)
+def load_all_data(data_catalog):
+    sheets = data_catalog.sheets
+    return {name: sheets[name] for name in sheets}
 
-def get_full_excel_bytes():
+@st.cache_data(max_entries=2, show_spinner=False)
+def _read_full_excel(version):
     with open(FILE_PATH, "rb") as f:
         return f.read()
 
+def get_full_excel_bytes(version):
+    # Se lee una vez por versión del archivo
+    return _read_full_excel(version)
+
 # --- FUNCIONES DE FILTRADO Y EXPORTACIÓN ---
-def filter_data(df, search_text, tema_filter, freq_filter):
+def filter_data(df, search_text, tema_filter, freq_filter, search_index=None):
+    facets = {}
+    if tema_filter != "Todos":
+        facets['Tema'] = tema_filter
+    if freq_filter != "Todas":
+        facets['Frecuencia'] = freq_filter
+
+    if search_index is not None:
+        # Intersección de conjuntos en el índice precalculado (df debe ser el mismo catálogo)
+        dff = df.iloc[search_index.search(search_text, facets)]
+        # Exclusión de la serie Heymann del buscador general
+        return dff[dff['ID'] != ID_HEYMANN].copy()
+
     # Exclusión de la serie Heymann del buscador general
     dff = df[df['ID'] != ID_HEYMANN].copy()
     
@@ -61,30 +114,105 @@ def filter_data(df, search_text, tema_filter, freq_filter):
             dff['Pestaña'].astype(str).str.contains(search_text, case=False, na=False)
         )
         dff = dff[mask]
-    if tema_filter != "Todos":
-        dff = dff[dff['Tema'] == tema_filter]
-    if freq_filter != "Todas":
-        dff = dff[dff['Frecuencia'] == freq_filter]
+    for column, value in facets.items():
+        dff = dff[dff[column] == value]
     return dff
 
-def convert_df_to_excel_filtered(metadata_selected, data_dict):
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_transformed_series(version, var_id, transform, frecuencia, params, _series_store):
+    """Serie derivada, memoizada por (versión, ID, transformación, parámetros); `_series_store`
+    debe ser el de esa versión"""
+    perf.incr("series_transformadas.miss")
+    serie = _series_store.get(var_id)
+    if serie is None:
+        return None
+    params = dict(params)
+    deflator = None
+    if transform == "Deflactada":
+        deflator = _series_store.get(params.get("deflactor"))
+        if deflator is None:
+            return None
+    return transforms.apply(serie, transform, frecuencia, deflator=deflator, **params)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_downsampled_series(version, var_id, transform, params, freq_comun, modo_agregacion, window, method, _serie):
+    """Traza reducida (`_serie` ya transformada, agregada y recortada), memoizada por todo lo que
+    la determina: los clics en la leyenda no vuelven a correr LTTB"""
+    perf.incr("series_reducidas.miss")
+    return downsample.downsample(_serie, downsample.ANCHO_GRAFICO_PX, method=method)
+
+def export_sheet_frame(series_store, tab_name, variables, window=None):
+    """Hoja (Fecha + variables elegidas, sólo las fechas de `window` si se indica) lista para escribir"""
+    sheet = series_store.compact(tab_name)
+    if sheet is None: return None
+    return sheet.to_frame(variables, window=window).reset_index()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_export_sheet_frame(version, tab_name, variables, window, _series_store):
+    perf.incr("hojas_exportacion.miss")
+    # Por hoja: agregar una serie no vuelve a preparar las demás pestañas
+    return export_sheet_frame(_series_store, tab_name, variables, window)
+
+def convert_df_to_excel_filtered(metadata_selected, series_store, version=None, window=None):
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         meta_to_save = metadata_selected.drop(columns=['Seleccionar', 'Fuente_Label'], errors='ignore')
         meta_to_save.to_excel(writer, sheet_name='Indice', index=False)
         grouped = metadata_selected.groupby('Pestaña')
         for tab_name, group in grouped:
-            if tab_name in data_dict:
-                full_df = data_dict[tab_name].copy()
-                if 'Fecha' not in full_df.columns and not full_df.empty:
-                    full_df.rename(columns={full_df.columns[0]: 'Fecha'}, inplace=True)
-                if 'Fecha' in full_df.columns:
-                     full_df['Fecha'] = pd.to_datetime(full_df['Fecha'], errors='coerce')
-                vars_to_keep = ['Fecha'] + [v for v in group['Variable'] if v in full_df.columns]
-                filtered_tab_df = full_df[vars_to_keep].copy()
-                filtered_tab_df.to_excel(writer, sheet_name=tab_name, index=False)
+            variables = tuple(group['Variable'])
+            if version is not None:
+                perf.incr("hojas_exportacion.llamadas")
+                sheet_df = _cached_export_sheet_frame(version, tab_name, variables, window, series_store)
+            else:
+                sheet_df = export_sheet_frame(series_store, tab_name, variables, window)
+            if sheet_df is not None:
+                sheet_df.to_excel(writer, sheet_name=tab_name, index=False)
     return output.getvalue()
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_filtered_excel_bytes(selected_ids, version, window, _data_catalog):
+    """Excel de la selección, memoizado por la tupla ordenada de IDs, la versión del libro y la ventana de fechas"""
+    df_index = _data_catalog.index
+    selected = df_index[df_index['ID'].isin(selected_ids)]
+    return convert_df_to_excel_filtered(selected, _data_catalog.series, version=version, window=window)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_selection_export_bytes(selected_ids, fmt, layout, version, window, _series_store):
+    """Selección en CSV/Parquet/Feather (tabla ancha o larga), memoizada como el Excel filtrado"""
+    table = export.build_table([align.slice_window(_series_store.get(i), window) for i in selected_ids], layout)
+    return export.export_bytes(table, fmt)
+
+# --- INSTRUMENTACIÓN ---
+def perf_enabled():
+    """Panel de rendimiento: SERIESMACRO_DEBUG=1 o ?debug=1 (queda activo el resto de la sesión)"""
+    if st.query_params.get("debug") == "1":
+        st.session_state['_perf_debug'] = True
+    return DEBUG or st.session_state.get('_perf_debug', False)
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx().session_id
+    except Exception:
+        return None
+
+@contextmanager
+def perf_run(name):
+    """Pasada instrumentada (rerun o fragmento); con el panel activo queda en el historial de la sesión"""
+    enabled = perf_enabled()
+    with perf.run(name, detail=enabled or perf.LOG_ENABLED, sesion=_session_id(), vista=st.session_state.get('view')) as rec:
+        yield rec
+    if rec is not None and enabled:
+        historial = st.session_state.setdefault('_perf_historial', [])
+        historial.append(rec.as_dict())
+        del historial[:-perf.HISTORIAL]
+
+def perf_download(name, make_bytes):
+    """Callable para st.download_button(data=...) que registra el tamaño generado al hacer clic"""
+    sink, sesion = st.session_state.setdefault('_perf_descargas', []), _session_id()
+    return lambda: perf.download(name, make_bytes, sink=sink, sesion=sesion)
+
 def convert_single_sheet_to_excel(df, sheet_name):
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
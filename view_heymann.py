@@ -1,81 +1,162 @@
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import hashlib
 import io
+import plotly.graph_objects as go
 import utils  # Importamos nuestro módulo de utilidades
+import kde
+import perf
 
-def plot_heymann_camel(df):
-    """Genera el gráfico de densidad kernel (Camello)"""
-    if df.empty: return None
-    
-    # Preprocesamiento
-    df = df.copy()
-    cols = df.columns
-    df.rename(columns={cols[0]: 'Fecha', cols[1]: 'Valor'}, inplace=True)
-    
-    df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce')
-    df = df.dropna(subset=['Fecha', 'Valor'])
-    
-    if df.empty: return None
+# Sub-períodos para comparar densidades (inicio, fin); None = abierto
+PERIODOS = {
+    "Muestra completa": (None, None),
+    "Convertibilidad (1991-2001)": ("1991-04-01", "2001-12-31"),
+    "Post-2002": ("2002-01-01", None),
+}
+PERIODO_PERSONALIZADO = "Personalizado"
+COLORES_PERIODOS = ['#4da6ff', '#98C1D9', '#F7C59F', '#EF233C', '#FFBF69']
 
-    # Estadísticas
-    mean_val = df['Valor'].mean()
-    last_row = df.iloc[-1]
-    last_val = last_row['Valor']
-    last_date = last_row['Fecha']
-    
-    # Formato fecha (ej: Sep-25)
-    last_date_str = last_date.strftime("%b-%y").capitalize()
+def series_fingerprint(serie):
+    """Hash del contenido (fechas y valores): clave de las cachés de esta vista"""
+    return hashlib.sha1(pd.util.hash_pandas_object(serie, index=True).to_numpy().tobytes()).hexdigest()
 
-    # Estilo Matplotlib Oscuro
-    plt.style.use('dark_background')
-    
-    # Ajustamos figsize para que sea más "panorámico" y entre en una pantalla (menos altura)
-    fig, ax = plt.subplots(figsize=(12, 5.2)) 
-    
-    fig.patch.set_facecolor('none')
-    ax.set_facecolor('none')
+def plot_heymann_camel(binned, periodos):
+    """Camello en matplotlib (para el PNG), con las mismas densidades y períodos que el gráfico Plotly"""
+    # matplotlib se importa recién acá: solo lo necesita la descarga en PNG
+    import matplotlib.style
+    from matplotlib.figure import Figure
 
-    # Plot
-    sns.kdeplot(df['Valor'], color='#4da6ff', fill=True, alpha=0.3, linewidth=2, ax=ax, label='Densidad')
+    if not len(binned.dates): return None
 
-    # Líneas de referencia
-    ax.axvline(mean_val, linestyle='--', color=utils.PALETA_NARANJAS[0], label=f'Promedio ({mean_val:.2f})')
-    ax.axvline(last_val, linestyle='--', color='#00ff00', label=f'{last_date_str} ({last_val:.2f})')
+    # Estilo Matplotlib Oscuro. Se usa Figure directamente (sin pyplot) para que
+    # la figura no quede registrada en el estado global entre reruns/sesiones
+    with matplotlib.style.context('dark_background'):
+        # Ajustamos figsize para que sea más "panorámico" y entre en una pantalla (menos altura)
+        fig = Figure(figsize=(12, 5.2))
+        ax = fig.subplots()
 
-    # Textos (Actualizado con "Dic 2001=100")
-    ax.set_title('Estimación de Densidad Kernel para Tipo de Cambio Real Oficial Dic 2001=100', color='white', fontsize=14, pad=15)
-    ax.set_xlabel('Valor del Índice', color='white')
-    ax.set_ylabel('Densidad', color='white')
-    
-    # Ajustes visuales
-    ax.tick_params(colors='white')
-    legend = ax.legend(frameon=False)
-    plt.setp(legend.get_texts(), color='white')
-    ax.grid(True, linestyle=':', alpha=0.3, color='gray')
-    sns.despine(left=True, bottom=True)
-    
-    # Reducimos márgenes para maximizar espacio
-    plt.tight_layout()
-    
+        fig.patch.set_facecolor('none')
+        ax.set_facecolor('none')
+
+        # Una densidad por período, con su promedio
+        for i, (label, (start, end)) in enumerate(periodos.items()):
+            density = binned.density(start, end)
+            if density is None: continue
+            n, mean_val, _, _ = binned.window_stats(start, end)
+            color = COLORES_PERIODOS[i % len(COLORES_PERIODOS)]
+            ax.plot(binned.grid, density, color=color, linewidth=2, label=f"{label} (n={n})")
+            ax.fill_between(binned.grid, density, color=color, alpha=0.3, linewidth=0)
+            ax.axvline(mean_val, linestyle='--', color=color if i else utils.PALETA_NARANJAS[0], label=f'Promedio {label} ({mean_val:.2f})')
+
+        # Último dato
+        last_val = binned.window_stats()[3]
+        last_date_str = binned.dates[-1].strftime("%b-%y").capitalize()
+        ax.axvline(last_val, linestyle='--', color='#00ff00', label=f'{last_date_str} ({last_val:.2f})')
+
+        # Textos (Actualizado con "Dic 2001=100")
+        ax.set_title('Estimación de Densidad Kernel para Tipo de Cambio Real Oficial Dic 2001=100', color='white', fontsize=14, pad=15)
+        ax.set_xlabel('Valor del Índice', color='white')
+        ax.set_ylabel('Densidad', color='white')
+
+        # Ajustes visuales
+        ax.tick_params(colors='white')
+        legend = ax.legend(frameon=False)
+        for text in legend.get_texts():
+            text.set_color('white')
+        ax.grid(True, linestyle=':', alpha=0.3, color='gray')
+        for side in ('top', 'right', 'left', 'bottom'):
+            ax.spines[side].set_visible(False)
+
+        # Reducimos márgenes para maximizar espacio
+        fig.tight_layout()
+
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def render_camel_png(fingerprint, periodos, _binned):
+    """PNG del camello, renderizado una sola vez por versión de los datos y períodos elegidos"""
+    fig = plot_heymann_camel(_binned, dict(periodos))
+    if fig is None: return None
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", transparent=True, bbox_inches='tight')
+    fig.clear()
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def heymann_excel_bytes(fingerprint, _df):
+    return utils.convert_single_sheet_to_excel(_df, utils.SHEET_HEYMANN)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_binned_kde(fingerprint, _serie):
+    """Conteos binneados de la serie, reutilizados por todas las ventanas"""
+    return kde.BinnedKDE(_serie)
+
+def build_camel_figure(binned, periodos):
+    """Camello interactivo (Plotly): una densidad por período, con su promedio y el último dato"""
+    fig = go.Figure()
+    for i, (label, (start, end)) in enumerate(periodos.items()):
+        density = binned.density(start, end)
+        if density is None: continue
+        n, mean_val, _, _ = binned.window_stats(start, end)
+        color = COLORES_PERIODOS[i % len(COLORES_PERIODOS)]
+        fig.add_trace(go.Scatter(
+            x=binned.grid, y=density, name=f"{label} (n={n})", mode='lines', fill='tozeroy',
+            line=dict(color=color, width=2), hovertemplate='%{x:.2f}: %{y:.4f}<extra></extra>'
+        ))
+        fig.add_vline(x=mean_val, line_dash='dash', line_color=color if i else utils.PALETA_NARANJAS[0],
+                      annotation_text=f"Promedio {label} ({mean_val:.2f})", annotation_font_color="white")
+
+    if len(binned.dates):
+        last_val = binned.window_stats()[3]
+        last_date = binned.dates[-1].strftime("%b-%y").capitalize()
+        fig.add_vline(x=last_val, line_dash='dash', line_color='#00ff00',
+                      annotation_text=f"{last_date} ({last_val:.2f})", annotation_position="top left", annotation_font_color="white")
+
+    fig.update_layout(
+        title=dict(text='Estimación de Densidad Kernel para Tipo de Cambio Real Oficial Dic 2001=100', font=dict(color='white', size=16)),
+        template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"), height=520, margin=dict(l=0, r=0, t=50, b=0),
+        legend=dict(orientation="h", yanchor="bottom", y=1.0, x=0),
+        xaxis_title='Valor del Índice', yaxis_title='Densidad', hovermode="x unified",
+    )
+    fig.update_xaxes(showgrid=True, gridcolor="#333333")
+    fig.update_yaxes(showgrid=True, gridcolor="#333333")
     return fig
 
-def show(all_data_sheets):
+def show(series_store):
     """Función principal para renderizar la vista de Heymann"""
     # Sin título Markdown superior
     
-    if utils.SHEET_HEYMANN in all_data_sheets:
-        df_heymann = all_data_sheets[utils.SHEET_HEYMANN]
+    sheet_heymann = series_store.compact(utils.SHEET_HEYMANN)
+    if sheet_heymann is not None:
+        df_heymann = series_store.sheets[utils.SHEET_HEYMANN]
         
-        fig = plot_heymann_camel(df_heymann)
+        serie_heymann = sheet_heymann.series(sheet_heymann.columns[0]).dropna() if sheet_heymann.columns else None
         
-        if fig:
+        if serie_heymann is not None and not serie_heymann.empty:
+            fingerprint = series_fingerprint(serie_heymann)
+            binned = load_binned_kde(fingerprint, serie_heymann)
+
+            # Períodos a superponer (cada ventana extra cuesta O(grilla))
+            c_per, c_custom = st.columns([2, 3], gap="medium")
+            with c_per:
+                elegidos = st.multiselect("Períodos", list(PERIODOS) + [PERIODO_PERSONALIZADO], default=["Muestra completa"], key="heymann_periodos")
+            periodos = {p: PERIODOS[p] for p in elegidos if p in PERIODOS}
+            if PERIODO_PERSONALIZADO in elegidos:
+                with c_custom:
+                    d_min, d_max = serie_heymann.index[0].date(), serie_heymann.index[-1].date()
+                    desde, hasta = st.slider("Período personalizado", min_value=d_min, max_value=d_max, value=(d_min, d_max), format="MMM YYYY", key="heymann_custom")
+                periodos[f"{desde:%b-%y} a {hasta:%b-%y}"] = (pd.Timestamp(desde), pd.Timestamp(hasta))
+            if not periodos:
+                periodos = {"Muestra completa": PERIODOS["Muestra completa"]}
+
             # Layout: 6 partes gráfico, 1 parte botones (para que sean angostos)
             col_graph, col_buttons = st.columns([6, 1], gap="medium")
             
             with col_graph:
-                st.pyplot(fig, width="stretch")
+                fig = build_camel_figure(binned, periodos)
+                st.plotly_chart(fig, width="stretch", config={'displayModeBar': True, 'displaylogo': False})
+                perf.payload("plotly_chart", lambda: len(fig.to_json()))
             
             with col_buttons:
                 # Espaciadores para bajar los botones y centrarlos verticalmente respecto al gráfico
@@ -86,12 +167,11 @@ def show(all_data_sheets):
                 st.write("")
                 st.write("")
                 
-                # Botón Descargar Gráfico
-                buf = io.BytesIO()
-                fig.savefig(buf, format="png", transparent=True, bbox_inches='tight')
+                # Botón Descargar Gráfico: el PNG (matplotlib, mismos períodos que en pantalla) se genera recién al hacer clic y queda cacheado
                 st.download_button(
                     label="Descargar Gráfico",
-                    data=buf.getvalue(),
+                    data=utils.perf_download("camello_png", lambda: render_camel_png(fingerprint, tuple(periodos.items()), binned)),
+                    on_click="ignore",
                     file_name="camello_heymann.png",
                     mime="image/png",
                     width="stretch"
@@ -100,7 +180,8 @@ def show(all_data_sheets):
                 st.write("") # Pequeño espacio entre botones
                 
                 # Botón Descargar Excel
-                excel_single = utils.convert_single_sheet_to_excel(df_heymann, utils.SHEET_HEYMANN)
+                excel_single = heymann_excel_bytes(fingerprint, df_heymann)
+                perf.payload("download_button", lambda: len(excel_single))
                 st.download_button(
                     label="Descargar Datos",
                     data=excel_single,
@@ -3,9 +3,79 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import utils # Importamos utilidades
+import align
+import export
+import perf
+import transforms
+import share
 
-def show(df_index, all_data_sheets):
+def add_series_trace(fig, serie, var_name, color_final, chart_type, use_secondary, webgl=False):
+    """Agrega la traza de una serie según su tipo. Barras y áreas quedan en SVG (WebGL no las soporta bien)"""
+    scatter = go.Scattergl if webgl else go.Scatter
+    if chart_type == "Barras":
+        fig.add_trace(go.Bar(x=serie.index, y=serie, name=var_name, marker_color=color_final, hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
+    elif chart_type == "Área":
+        # --- CORRECCIÓN 2: connectgaps=True en Área ---
+        fig.add_trace(go.Scatter(x=serie.index, y=serie, name=var_name, fill='tozeroy', mode='lines', connectgaps=True, line=dict(color=color_final, width=2), hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
+    elif chart_type == "Puntos":
+        fig.add_trace(scatter(x=serie.index, y=serie, name=var_name, mode='markers', marker=dict(color=color_final, size=6), hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
+    else:
+        # --- CORRECCIÓN 3: connectgaps=True en Línea (default) ---
+        fig.add_trace(scatter(x=serie.index, y=serie, name=var_name, line=dict(color=color_final, width=2), mode='lines', connectgaps=True, hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
+
+# --- CALLBACKS ---
+# Corren antes del rerun que provoca el widget: cada interacción cuesta una sola pasada
+def _apply_editor_selection(editor_key, view_ids):
+    """Pasa los checks del editor a selected_ids"""
+    for pos, cambios in st.session_state[editor_key].get("edited_rows", {}).items():
+        if "Seleccionar" in cambios:
+            var_id = view_ids[int(pos)]
+            if cambios["Seleccionar"]:
+                st.session_state['selected_ids'].add(var_id)
+            else:
+                st.session_state['selected_ids'].discard(var_id)
+
+def _toggle_axis(var_id):
+    actual = st.session_state['axes_config'].get(var_id, "Izquierdo")
+    st.session_state['axes_config'][var_id] = "Derecho" if actual == "Izquierdo" else "Izquierdo"
+
+def _toggle_visibility(var_id):
+    st.session_state['visibility_map'][var_id] = not st.session_state['visibility_map'].get(var_id, True)
+
+def _store_widget(state_key, var_id, widget_key):
+    st.session_state[state_key][var_id] = st.session_state[widget_key]
+
+def _set_transform(var_id, widget_key, serie_raw, frecuencia, otros_ids):
+    nombre = st.session_state[widget_key]
+    params = transforms.default_params(nombre, serie_raw, frecuencia)
+    if nombre == "Deflactada" and otros_ids:
+        params["deflactor"] = otros_ids[0]
+    st.session_state['transform_map'][var_id] = {"nombre": nombre, "params": params}
+
+def _set_transform_param(var_id, param, widget_key):
+    value = st.session_state[widget_key]
+    if param == "base":
+        value = value.strftime('%Y-%m-%d')
+    elif param == "ventana":
+        value = int(value)
+    st.session_state['transform_map'][var_id]['params'][param] = value
+
+def _clear_all():
+    st.session_state['selected_ids'] = set()
+    st.session_state['axes_config'] = {}
+    st.session_state['visibility_map'] = {}
+    st.session_state['color_map'] = {}
+    st.session_state['chart_type_map'] = {}
+    st.session_state['transform_map'] = {}
+    for k in ["s_text", "s_tema", "s_freq"]:
+        if k in st.session_state: del st.session_state[k]
+    # Editor nuevo (sin checks pendientes) y rerun completo para redibujarlo
+    st.session_state['editor_gen'] = st.session_state.get('editor_gen', 0) + 1
+    st.session_state['_rerun_app'] = True
+
+def show(data_catalog):
     """Función principal para renderizar la vista Macro"""
+    df_index = data_catalog.index
     
     container_top_graph = st.container()
     container_bottom_editor = st.container()
@@ -24,7 +94,8 @@ def show(df_index, all_data_sheets):
             freq_sel = st.selectbox("⏰ Filtrar por Frecuencia", freqs, key="s_freq")
 
         # 1. Filtrar
-        df_filtered_view = utils.filter_data(df_index, search_text, tema_sel, freq_sel)
+        with perf.span("filtro"):
+            df_filtered_view = utils.filter_data(df_index, search_text, tema_sel, freq_sel, search_index=data_catalog.search)
         
         # 2. Estado Visual (Checkbox)
         df_filtered_view['Seleccionar'] = df_filtered_view['ID'].isin(st.session_state['selected_ids'])
@@ -33,208 +104,326 @@ def show(df_index, all_data_sheets):
             lambda x: "MECON" if str(x).startswith("https://www.economia.gob.ar") else x
         )
 
-        # 3. Key estable para evitar saltos
-        stable_key = f"editor_v2_{search_text}_{tema_sel}_{freq_sel}"
-
-        edited_df = st.data_editor(
-            df_filtered_view,
-            column_config={
-                "Seleccionar": st.column_config.CheckboxColumn("Seleccionar", default=False),
-            },
-            column_order=["Seleccionar", "Variable", "Tema", "Frecuencia", "Pestaña"], 
-            disabled=["Variable", "Tema", "Frecuencia", "Pestaña", "ID"],
-            hide_index=True, 
-            width="stretch", 
-            height=300,
-            key=stable_key
-        )
+        # Resumen precalculado con la caché: rango, último dato y tendencia sin graficar
+        resumen = data_catalog.summary
+        columnas_resumen = list(resumen.columns) if not resumen.empty else []
+        if columnas_resumen:
+            df_filtered_view = df_filtered_view.join(resumen, on='ID')
 
-        # 4. Sincronización
-        new_selection = set(edited_df[edited_df['Seleccionar']]['ID'])
-        old_selection_in_view = set(df_filtered_view[df_filtered_view['Seleccionar']]['ID'])
-        
-        added_ids = new_selection - old_selection_in_view
-        removed_ids = old_selection_in_view - new_selection
-        
-        if added_ids or removed_ids:
-            st.session_state['selected_ids'].update(added_ids)
-            st.session_state['selected_ids'].difference_update(removed_ids)
-            st.rerun()
+        # 3. Key estable para evitar saltos (cambia al limpiar la selección)
+        stable_key = f"editor_v2_{search_text}_{tema_sel}_{freq_sel}_{st.session_state.get('editor_gen', 0)}"
+
+        # 4. Sincronización en el callback: el rerun del check ya dibuja el gráfico actualizado
+        with perf.span("editor"):
+            st.data_editor(
+                df_filtered_view,
+                column_config={
+                    "Seleccionar": st.column_config.CheckboxColumn("Seleccionar", default=False),
+                    "Desde": st.column_config.DateColumn("Desde", format="MMM YYYY"),
+                    "Hasta": st.column_config.DateColumn("Hasta", format="MMM YYYY"),
+                    "Obs.": st.column_config.NumberColumn("Obs.", format="%d"),
+                    "Último": st.column_config.NumberColumn("Último", format="%.4g"),
+                    "Mín.": st.column_config.NumberColumn("Mín.", format="%.4g"),
+                    "Máx.": st.column_config.NumberColumn("Máx.", format="%.4g"),
+                    "Tendencia": st.column_config.LineChartColumn("Tendencia", width="small"),
+                },
+                column_order=["Seleccionar", "Variable", "Tema", "Frecuencia", "Pestaña"] + columnas_resumen, 
+                disabled=["Variable", "Tema", "Frecuencia", "Pestaña", "ID"] + columnas_resumen,
+                hide_index=True, 
+                width="stretch", 
+                height=300,
+                key=stable_key,
+                on_change=_apply_editor_selection,
+                args=(stable_key, list(df_filtered_view['ID'])),
+            )
 
     # --- GRÁFICO (ARRIBA) ---
     with container_top_graph:
-        selected_rows_global = df_index[df_index['ID'].isin(st.session_state['selected_ids'])].copy()
-
-        if not selected_rows_global.empty:
-            c_chart, c_legend = st.columns([4, 1.6]) 
-            
-            with c_chart:
-                fig = make_subplots(specs=[[{"secondary_y": True}]])
-                plot_data_full = pd.DataFrame()
-                series_metadata = [] 
-
-                for idx, row in selected_rows_global.iterrows():
-                    var_id = str(row['ID'])
-                    
-                    # Defaults
-                    if var_id not in st.session_state['axes_config']: st.session_state['axes_config'][var_id] = "Izquierdo"
-                    if var_id not in st.session_state['visibility_map']: st.session_state['visibility_map'][var_id] = True 
-                    if var_id not in st.session_state['chart_type_map']: st.session_state['chart_type_map'][var_id] = "Línea"
-
-                    # Color
-                    default_color = utils.PALETA_NARANJAS[idx % len(utils.PALETA_NARANJAS)]
-                    if var_id in st.session_state['color_map']: color_final = st.session_state['color_map'][var_id]
-                    else: color_final = default_color
-
-                    eje_pref = st.session_state['axes_config'][var_id]
-                    is_visible = st.session_state['visibility_map'][var_id]
-                    chart_type = st.session_state['chart_type_map'][var_id]
-                    
-                    tab_name = row['Pestaña']
-                    var_name = row['Variable']
-                    
-                    if tab_name in all_data_sheets:
-                        sheet_df = all_data_sheets[tab_name].copy()
-                        if 'Fecha' not in sheet_df.columns and not sheet_df.empty:
-                            sheet_df.rename(columns={sheet_df.columns[0]: 'Fecha'}, inplace=True)
-                        
-                        if 'Fecha' in sheet_df.columns:
-                            sheet_df['Fecha'] = pd.to_datetime(sheet_df['Fecha'], errors='coerce')
-                            sheet_df = sheet_df.dropna(subset=['Fecha'])
-                            
-                            if var_name in sheet_df.columns:
-                                serie = sheet_df[['Fecha', var_name]].set_index('Fecha').sort_index()
-                                serie.columns = [var_id]
-                                
-                                # --- CORRECCIÓN 1: Forzar valores numéricos (limpia textos y convierte a NaN) ---
-                                serie[var_id] = pd.to_numeric(serie[var_id], errors='coerce')
-                                
-                                plot_data_full = serie if plot_data_full.empty else plot_data_full.join(serie, how='outer')
-                                
-                                if is_visible:
-                                    use_secondary = (eje_pref == "Derecho")
-                                    
-                                    if chart_type == "Barras":
-                                        fig.add_trace(go.Bar(x=serie.index, y=serie[var_id], name=var_name, marker_color=color_final, hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
-                                    elif chart_type == "Área":
-                                        # --- CORRECCIÓN 2: connectgaps=True en Área ---
-                                        fig.add_trace(go.Scatter(x=serie.index, y=serie[var_id], name=var_name, fill='tozeroy', mode='lines', connectgaps=True, line=dict(color=color_final, width=2), hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
-                                    elif chart_type == "Puntos":
-                                        fig.add_trace(go.Scatter(x=serie.index, y=serie[var_id], name=var_name, mode='markers', marker=dict(color=color_final, size=6), hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
-                                    else: 
-                                        # --- CORRECCIÓN 3: connectgaps=True en Línea (default) ---
-                                        fig.add_trace(go.Scatter(x=serie.index, y=serie[var_id], name=var_name, line=dict(color=color_final, width=2), mode='lines', connectgaps=True, hovertemplate='%{y}<extra></extra>'), secondary_y=use_secondary)
-                                
-                                series_metadata.append({
-                                    "id": var_id, "name": var_name, "color": color_final,
-                                    "axis": eje_pref, "visible": is_visible, "type": chart_type
-                                })
-
-                if not plot_data_full.empty:
-                    plot_data_full = plot_data_full.sort_index()
-                    fig.update_layout(
-                        hovermode="x unified", template="plotly_dark", showlegend=False, 
-                        margin=dict(l=0, r=0, t=30, b=0), height=500,
-                        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
-                        font=dict(color="white")
-                    )
-                    fig.update_xaxes(
-                        tickmode='auto', nticks=15, showspikes=True, spikemode='across',
-                        spikesnap='cursor', showline=True, spikecolor="gray", spikethickness=1,
-                        rangeslider=dict(visible=True, bgcolor="#222222", thickness=0.05, bordercolor=utils.COLOR_SLIDER_BORDE, borderwidth=1),
-                        rangeselector=dict(
-                            buttons=list([
-                                dict(count=6, label="6m", step="month", stepmode="backward"),
-                                dict(count=1, label="1y", step="year", stepmode="backward"),
-                                dict(step="all", label="Todo")
-                            ]),
-                            bgcolor=utils.COLOR_BOTONES_RANGO_FONDO, activecolor=utils.COLOR_BOTONES_ACTIVO, font=dict(color=utils.COLOR_BOTONES_RANGO_TEXTO)
-                        ),
-                        type="date", showgrid=True, gridcolor="#333333"
+        chart_panel()
+
+def _fit_transform_params(transform, fechas, otros_ids):
+    """Ajusta los parámetros guardados a lo que muestran los controles: la base dentro del rango
+    de la serie (puede achicarse al recargar el libro) y un deflactor que siga seleccionado"""
+    params = transform['params']
+    if transform['nombre'] == "Base 100" and len(fechas):
+        base = pd.Timestamp(params.get('base') or fechas[0])
+        params['base'] = min(max(base, fechas[0]), fechas[-1]).strftime('%Y-%m-%d')
+    elif transform['nombre'] == "Deflactada" and params.get('deflactor') not in otros_ids:
+        params['deflactor'] = otros_ids[0] if otros_ids else None
+
+def build_chart(selected_rows, series_store, state, data_version, freq_comun="Original", modo_agregacion="Último", full_resolution=False, render_mode="Auto", window=None):
+    """Figura de las series seleccionadas y metadatos de la leyenda (None si no hay datos).
+    `state` es st.session_state o un dict con los mismos mapas (axes_config, color_map, ...).
+    `window` (desde, hasta) recorta cada serie antes de armar las trazas"""
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    series_plot = []
+    series_metadata = [] 
+    trazas = []
+    # Series de la selección que existen en el catálogo (candidatas a deflactor)
+    disponibles = [str(i) for i in selected_rows['ID'] if series_store.get(str(i)) is not None]
+
+    for idx, row in selected_rows.iterrows():
+        var_id = str(row['ID'])
+
+        # Defaults
+        if var_id not in state['axes_config']: state['axes_config'][var_id] = "Izquierdo"
+        if var_id not in state['visibility_map']: state['visibility_map'][var_id] = True 
+        if var_id not in state['chart_type_map']: state['chart_type_map'][var_id] = "Línea"
+
+        # Color
+        default_color = utils.PALETA_NARANJAS[idx % len(utils.PALETA_NARANJAS)]
+        if var_id in state['color_map']: color_final = state['color_map'][var_id]
+        else: color_final = default_color
+
+        eje_pref = state['axes_config'][var_id]
+        is_visible = state['visibility_map'][var_id]
+        chart_type = state['chart_type_map'][var_id]
+        transform = state['transform_map'].get(var_id, {"nombre": transforms.ORIGINAL, "params": {}})
+
+        var_name = row['Variable']
+        serie = series_store.get(var_id)
+
+        if serie is not None:
+            fechas_validas = serie.dropna().index
+            _fit_transform_params(transform, fechas_validas, [i for i in disponibles if i != var_id])
+            if transform['nombre'] != transforms.ORIGINAL:
+                # Memoizada por (ID, transformación, parámetros): cambiar otra serie no la recalcula
+                perf.incr("series_transformadas.llamadas")
+                derivada = utils.get_transformed_series(data_version, var_id, transform['nombre'], row['Frecuencia'], tuple(sorted(transform['params'].items())), series_store)
+                if derivada is not None:
+                    serie = derivada
+                    var_name = f"{var_name} ({transforms.SUFIJOS[transform['nombre']]})"
+            if freq_comun != "Original":
+                serie = align.to_frequency(serie, freq_comun, align.MODOS_AGREGACION[modo_agregacion])
+            # Después de transformar (la variación i.a. necesita la historia previa) y antes de reducir puntos
+            serie = align.slice_window(serie, window)
+            series_plot.append(serie)
+
+            if is_visible:
+                if not full_resolution:
+                    metodo = "minmax" if chart_type in ("Barras", "Puntos") else "lttb"
+                    perf.incr("series_reducidas.llamadas")
+                    serie = utils.get_downsampled_series(
+                        data_version, var_id, transform['nombre'], tuple(sorted(transform['params'].items())),
+                        freq_comun, modo_agregacion, window, metodo, serie,
                     )
-                    fig.update_yaxes(title_text="", secondary_y=False, showgrid=True, gridcolor="#333333")
-                    fig.update_yaxes(title_text="", secondary_y=True, showgrid=False)
+                trazas.append((serie, var_name, color_final, chart_type, eje_pref == "Derecho"))
+
+            series_metadata.append({
+                "id": var_id, "name": var_name, "color": color_final,
+                "axis": eje_pref, "visible": is_visible, "type": chart_type,
+                "transform": transform, "freq": row['Frecuencia'], "fechas": fechas_validas
+            })
 
+    # WebGL cuando el total de puntos lo justifica (o por elección de la sesión)
+    total_puntos = sum(len(t[0]) for t in trazas)
+    use_webgl = render_mode == "WebGL" or (render_mode == "Auto" and total_puntos > utils.UMBRAL_PUNTOS_WEBGL)
+    for serie, var_name, color_final, chart_type, use_secondary in trazas:
+        add_series_trace(fig, serie, var_name, color_final, chart_type, use_secondary, webgl=use_webgl)
+
+    # Sin ningún punto en la selección (o en la ventana) no hay gráfico
+    if not any(len(s) for s in series_plot):
+        return None, series_metadata
+
+    fig.update_layout(
+        hovermode="x unified", template="plotly_dark", showlegend=False, 
+        margin=dict(l=0, r=0, t=30, b=0), height=500,
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white")
+    )
+    fig.update_xaxes(
+        tickmode='auto', nticks=15, showspikes=True, spikemode='across',
+        spikesnap='cursor', showline=True, spikecolor="gray", spikethickness=1,
+        rangeslider=dict(visible=True, bgcolor="#222222", thickness=0.05, bordercolor=utils.COLOR_SLIDER_BORDE, borderwidth=1),
+        rangeselector=dict(
+            buttons=list([
+                dict(count=6, label="6m", step="month", stepmode="backward"),
+                dict(count=1, label="1y", step="year", stepmode="backward"),
+                dict(step="all", label="Todo")
+            ]),
+            bgcolor=utils.COLOR_BOTONES_RANGO_FONDO, activecolor=utils.COLOR_BOTONES_ACTIVO, font=dict(color=utils.COLOR_BOTONES_RANGO_TEXTO)
+        ),
+        type="date", showgrid=True, gridcolor="#333333"
+    )
+    fig.update_yaxes(title_text="", secondary_y=False, showgrid=True, gridcolor="#333333")
+    fig.update_yaxes(title_text="", secondary_y=True, showgrid=False)
+    return fig, series_metadata
+
+def last_selected_date(selected_rows, data_catalog):
+    """Último dato de la selección: del resumen precalculado o, sin caché, de las series"""
+    resumen = data_catalog.summary
+    ids = [i for i in selected_rows['ID'] if i in resumen.index]
+    if ids:
+        return resumen.loc[ids, 'Hasta'].max()
+    fechas = [s.index[-1] for s in (data_catalog.series.get(i) for i in selected_rows['ID']) if s is not None and len(s)]
+    return max(fechas) if fechas else None
+
+@st.fragment
+def chart_panel():
+    """Controles, gráfico, leyenda y descargas. Los cambios de la leyenda sólo re-ejecutan este fragmento"""
+    # Dentro de un rerun completo es una etapa más; re-ejecutado solo, una pasada propia
+    with utils.perf_run("grafico"):
+        # Catálogo propio de esta pasada: re-ejecutado solo, el fragmento no conserva el del último rerun
+        data_catalog = utils.load_catalog()
+        if data_catalog is None: return
+        perf.track(data_catalog.stats)
+        _chart_panel(data_catalog)
+
+def _chart_panel(data_catalog):
+    df_index, series_store = data_catalog.index, data_catalog.series
+    selected_rows_global = df_index[df_index['ID'].isin(st.session_state['selected_ids'])].copy()
+    data_version = data_catalog.version
+
+    if not selected_rows_global.empty:
+        # Frecuencia común opcional para comparar series heterogéneas
+        c_freq, c_how, c_res, c_render, c_win, _ = st.columns([1.2, 1, 1.2, 1, 1, 2.2], gap="small")
+        with c_freq:
+            freq_comun = st.selectbox("Frecuencia común", share.OPCIONES_CONTROLES["align_freq"], key="align_freq")
+        with c_how:
+            modo_agregacion = st.selectbox("Agregación", share.OPCIONES_CONTROLES["align_how"], key="align_how", disabled=(freq_comun == "Original"))
+        with c_res:
+            # Por defecto cada traza se reduce a ~1 punto por píxel (LTTB / min-max)
+            full_resolution = st.toggle("Resolución completa", key="full_resolution", help="Envía todos los puntos al navegador (más lento con series diarias)")
+        with c_render:
+            render_mode = st.selectbox("Render", share.OPCIONES_CONTROLES["render_mode"], key="render_mode", help=f"Auto usa WebGL por encima de {utils.UMBRAL_PUNTOS_WEBGL:,} puntos (barras y áreas siempre en SVG)")
+        with c_win:
+            # A diferencia de los botones 6m/1y del gráfico, recorta en el servidor: menos puntos y descargas más chicas
+            ventana = st.selectbox("Período", share.OPCIONES_CONTROLES["date_window"], key="date_window", help="Fechas que se grafican y descargan, contadas desde el último dato de la selección")
+        window = align.window_bounds(ventana, last_selected_date(selected_rows_global, data_catalog))
+
+        c_chart, c_legend = st.columns([4, 1.6]) 
+        
+        with perf.span("armado"):
+            fig, series_metadata = build_chart(
+                selected_rows_global, series_store, st.session_state, data_version,
+                freq_comun, modo_agregacion, full_resolution, render_mode, window,
+            )
+        with c_chart:
+            if fig is None and window is not None:
+                st.info(f"Sin datos desde {window[0]}")
+            if fig is not None:
+                with perf.span("plotly_chart"):
                     st.plotly_chart(fig, width="stretch", config={'displayModeBar': True, 'displaylogo': False})
-            
-            # --- LISTA LATERAL (CONTROLES) ---
-            with c_legend:
-                st.markdown(f"""
-                    <style>
-                    div[data-testid="column"]:nth-of-type(2) button {{
-                        background-color: transparent !important; border: none !important; box-shadow: none !important;
-                        color: white !important; padding: 0px !important; text-align: left !important;
-                        width: 100%;
-                    }}
-                    div[data-testid="column"]:nth-of-type(2) button:hover {{ color: {utils.COLOR_BOTONES_ACTIVO} !important; }}
-                    </style>
-                """, unsafe_allow_html=True)
-
-                for item in series_metadata:
-                    c_ax, c_type, c_col, c_name = st.columns([0.15, 0.3, 0.15, 0.4], gap="small")
-                    
-                    with c_ax:
-                        current_ax = item['axis']
-                        label_ax = "🔴" if current_ax == "Izquierdo" else "🟢"
-                        if st.button(label_ax, key=f"ax_{item['id']}", help="Cambiar Eje"):
-                            new_val = "Derecho" if current_ax == "Izquierdo" else "Izquierdo"
-                            st.session_state['axes_config'][item['id']] = new_val
-                            st.rerun()
-
-                    with c_type:
-                        current_type = item['type']
-                        opciones_tipo = ["Línea", "Barras", "Área", "Puntos"]
-                        try: idx_sel = opciones_tipo.index(current_type)
-                        except: idx_sel = 0
-                        new_type = st.selectbox("Tipo", opciones_tipo, key=f"type_{item['id']}", label_visibility="collapsed", index=idx_sel)
-                        if new_type != current_type:
-                            st.session_state['chart_type_map'][item['id']] = new_type
-                            st.rerun()
-
-                    with c_col:
-                        new_color = st.color_picker("Color", value=item['color'], key=f"cp_{item['id']}", label_visibility="collapsed")
-                        if new_color != item['color']:
-                            st.session_state['color_map'][item['id']] = new_color
-                            st.rerun()
-
-                    with c_name:
-                        is_vis = item['visible']
-                        if is_vis:
-                            label_name = item['name']
-                        else:
-                            # HACK para color grisáceo
-                            safe_name = item['name'].replace("$", "").replace("{", "").replace("}", "").replace("_", " ")
-                            if len(safe_name) > 28:
-                                safe_name = safe_name[:26] + ".."
-                            
-                            label_name = fr"$\small\textsf{{\textcolor{{#888888}}{{ {safe_name} }} }}$"
+                perf.payload("plotly_chart", lambda: len(fig.to_json()))
+        
+        # --- LISTA LATERAL (CONTROLES) ---
+        with c_legend, perf.span("leyenda"):
+            st.markdown(f"""
+                <style>
+                div[data-testid="column"]:nth-of-type(2) button {{
+                    background-color: transparent !important; border: none !important; box-shadow: none !important;
+                    color: white !important; padding: 0px !important; text-align: left !important;
+                    width: 100%;
+                }}
+                div[data-testid="column"]:nth-of-type(2) button:hover {{ color: {utils.COLOR_BOTONES_ACTIVO} !important; }}
+                </style>
+            """, unsafe_allow_html=True)
+
+            for item in series_metadata:
+                c_ax, c_type, c_col, c_name = st.columns([0.15, 0.3, 0.15, 0.4], gap="small")
+                
+                with c_ax:
+                    label_ax = "🔴" if item['axis'] == "Izquierdo" else "🟢"
+                    st.button(label_ax, key=f"ax_{item['id']}", help="Cambiar Eje", on_click=_toggle_axis, args=(item['id'],))
+
+                with c_type:
+                    current_type = item['type']
+                    opciones_tipo = share.TIPOS_GRAFICO
+                    try: idx_sel = opciones_tipo.index(current_type)
+                    except: idx_sel = 0
+                    st.selectbox("Tipo", opciones_tipo, key=f"type_{item['id']}", label_visibility="collapsed", index=idx_sel,
+                                 on_change=_store_widget, args=('chart_type_map', item['id'], f"type_{item['id']}"))
+
+                with c_col:
+                    st.color_picker("Color", value=item['color'], key=f"cp_{item['id']}", label_visibility="collapsed",
+                                    on_change=_store_widget, args=('color_map', item['id'], f"cp_{item['id']}"))
+
+                with c_name:
+                    is_vis = item['visible']
+                    if is_vis:
+                        label_name = item['name']
+                    else:
+                        # HACK para color grisáceo
+                        safe_name = item['name'].replace("$", "").replace("{", "").replace("}", "").replace("_", " ")
+                        if len(safe_name) > 28:
+                            safe_name = safe_name[:26] + ".."
                         
-                        if st.button(label_name, key=f"vis_{item['id']}", help="Ocultar/Mostrar"):
-                            st.session_state['visibility_map'][item['id']] = not is_vis
-                            st.rerun()
+                        label_name = fr"$\small\textsf{{\textcolor{{#888888}}{{ {safe_name} }} }}$"
                     
-                    st.markdown("<div style='margin-bottom: 2px;'></div>", unsafe_allow_html=True)
-
-            # --- BOTONES DESCARGA ---
-            excel_filtered = utils.convert_df_to_excel_filtered(selected_rows_global, all_data_sheets)
-            excel_full = utils.get_full_excel_bytes()
-            
-            b_col1, b_void, b_col3, b_col4 = st.columns([2, 4, 2, 2], gap="small") 
-            
-            with b_col1:
-                if st.button("🗑 Limpiar búsqueda", width="stretch"):
-                    st.session_state['selected_ids'] = set()
-                    st.session_state['axes_config'] = {}
-                    st.session_state['visibility_map'] = {}
-                    st.session_state['color_map'] = {}
-                    st.session_state['chart_type_map'] = {}
-                    for k in ["s_text", "s_tema", "s_freq"]:
-                            if k in st.session_state: del st.session_state[k]
-                    st.rerun()
-
-            with b_col3: 
-                st.download_button(label="Descargar Datos (Filtrados)", data=excel_filtered, file_name="series_seleccion.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", width="stretch")
-            with b_col4: 
-                st.download_button(label="Descargar Base (Completa)", data=excel_full, file_name="BD_completa.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", width="stretch")
-        else:
-            st.info("⚠️ Selecciona series en el buscador de abajo para graficar ⚠️")
\ No newline at end of file
+                    st.button(label_name, key=f"vis_{item['id']}", help="Ocultar/Mostrar", on_click=_toggle_visibility, args=(item['id'],))
+                
+                # Transformación (y su parámetro, si tiene)
+                c_tr, c_par = st.columns([0.5, 0.5], gap="small")
+                current_tr = item['transform']['nombre']
+                params = item['transform']['params']
+                otros = {m['id']: m['name'] for m in series_metadata if m['id'] != item['id']}
+                with c_tr:
+                    st.selectbox("Transformación", transforms.TRANSFORMACIONES, key=f"tr_{item['id']}", label_visibility="collapsed", index=transforms.TRANSFORMACIONES.index(current_tr),
+                                 on_change=_set_transform, args=(item['id'], f"tr_{item['id']}", series_store.get(item['id']), item['freq'], list(otros)))
+
+                with c_par:
+                    if current_tr == "Promedio móvil":
+                        st.number_input("Ventana", min_value=transforms.VENTANA_MIN, max_value=transforms.VENTANA_MAX, value=int(params['ventana']), step=1, key=f"trw_{item['id']}", label_visibility="collapsed", help="Observaciones del promedio móvil",
+                                        on_change=_set_transform_param, args=(item['id'], "ventana", f"trw_{item['id']}"))
+                    elif current_tr == "Base 100" and len(item['fechas']):
+                        desde, hasta = item['fechas'][0].date(), item['fechas'][-1].date()
+                        base = min(max(pd.Timestamp(params['base']).date(), desde), hasta)
+                        st.date_input("Base", value=base, min_value=desde, max_value=hasta, key=f"trb_{item['id']}", label_visibility="collapsed", help="Base 100 en el último dato disponible a esa fecha",
+                                      on_change=_set_transform_param, args=(item['id'], "base", f"trb_{item['id']}"))
+                    elif current_tr == "Deflactada":
+                        if otros:
+                            opciones = list(otros)
+                            # Lo que se muestra es lo que se aplica (elegir la opción ya visible no dispara on_change)
+                            if params.get('deflactor') not in otros:
+                                params['deflactor'] = opciones[0]
+                            idx_def = opciones.index(params['deflactor'])
+                            st.selectbox("Deflactor", opciones, index=idx_def, format_func=otros.get, key=f"trd_{item['id']}", label_visibility="collapsed", help="Índice de precios (resultado a precios del último dato)",
+                                         on_change=_set_transform_param, args=(item['id'], "deflactor", f"trd_{item['id']}"))
+                        else:
+                            st.caption("Seleccioná un índice de precios")
+
+                st.markdown("<div style='margin-bottom: 2px;'></div>", unsafe_allow_html=True)
+
+        downloads_panel(window)
+    else:
+        st.info("⚠️ Selecciona series en el buscador de abajo para graficar ⚠️")
+
+    # La URL refleja el gráfico actual: sirve para compartirlo y sobrevive a una recarga
+    with perf.span("url"):
+        share.sync(st.session_state, st.query_params)
+
+@st.fragment
+def downloads_panel(window=None):
+    """Botones de descarga: cambiar el formato no vuelve a dibujar el gráfico.
+    Los datos de la selección se limitan a la ventana de fechas del gráfico"""
+    if st.session_state.pop('_rerun_app', False):
+        # "Limpiar" afecta al buscador y al gráfico: rerun completo, antes de dibujar nada
+        st.rerun()
+    with utils.perf_run("descargas"):
+        data_catalog = utils.load_catalog()
+        if data_catalog is None: return
+        _downloads_panel(data_catalog, window)
+
+def _downloads_panel(data_catalog, window):
+    # Se generan recién al hacer clic (memoizadas por selección y versión del libro)
+    selected_key = tuple(sorted(st.session_state['selected_ids']))
+    data_version = data_catalog.version
+    
+    b_col1, b_fmt, b_lay, b_exp, b_col3, b_col4 = st.columns([2, 1.1, 1, 1.9, 2, 2], gap="small") 
+    
+    with b_col1:
+        st.button("🗑 Limpiar búsqueda", width="stretch", on_click=_clear_all)
+
+    # Formatos rápidos para pipelines (tabla ancha o larga ID/Fecha/Valor)
+    with b_fmt:
+        formato = st.selectbox("Formato", list(export.FORMATOS), key="export_fmt", label_visibility="collapsed")
+    with b_lay:
+        layout = st.selectbox("Tabla", export.LAYOUTS, key="export_layout", label_visibility="collapsed")
+    with b_exp:
+        ext, mime = export.FORMATOS[formato]
+        st.download_button(label=f"Descargar {formato}", data=utils.perf_download(f"seleccion_{ext}", lambda: utils.get_selection_export_bytes(selected_key, formato, layout, data_version, window, data_catalog.series)), on_click="ignore", file_name=f"series_seleccion.{ext}", mime=mime, width="stretch")
+
+    with b_col3: 
+        st.download_button(label="Descargar Datos (Filtrados)", data=utils.perf_download("excel_filtrado", lambda: utils.get_filtered_excel_bytes(selected_key, data_version, window, data_catalog)), on_click="ignore", file_name="series_seleccion.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", width="stretch")
+    with b_col4: 
+        st.download_button(label="Descargar Base (Completa)", data=utils.perf_download("excel_completo", lambda: utils.get_full_excel_bytes(data_version)), on_click="ignore", file_name="BD_completa.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", width="stretch")